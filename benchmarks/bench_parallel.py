@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+ Measures how building the WKB of a large batch of shapes scales with the number of worker
+ processes, from 1 up to the number of CPUs. Optionally the shapes are also written to a
+ GeoPackage by the single writer.
+
+ Run with the Python interpreter that ships with QGIS:
+     python benchmarks/bench_parallel.py --shapes 1000000 --workers 1 2 4 8
+"""
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def specs(kernel, count, chunk_size, seed=0):
+    """Yields chunks of random shape records, half rectangles and half rotated ovals"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, chunk_size):
+        size = min(chunk_size, count - start)
+        chunk = kernel.spec_array(size)
+        chunk['id'] = np.arange(start, start + size)
+        chunk['shape'] = rng.integers(0, 2, size)
+        chunk['x'], chunk['y'] = rng.uniform(0, 100000, (2, size))
+        chunk['width'], chunk['height'] = rng.uniform(1, 100, (2, size))
+        chunk['rotation'] = rng.uniform(0, 360, size)
+        chunk['segments'] = 50
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--write', action='store_true', help='also write the shapes to a GeoPackage')
+    args = parser.parse_args()
+
+    # import as a package, so the worker processes can find the kernel
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    batch = importlib.import_module(os.path.basename(PLUGIN_DIR) + '.geometry_shapes_batch')
+    kernel = importlib.import_module(os.path.basename(PLUGIN_DIR) + '.geometry_shapes_kernel')
+
+    if args.write:
+        from qgis.core import QgsApplication, QgsCoordinateReferenceSystem, QgsFeatureSink
+        app = QgsApplication([], False)
+        app.initQgis()
+
+    print('{:>8} {:>12} {:>16} {:>8}'.format('workers', 'time (s)', 'shapes/s', 'speedup'))
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as workdir:
+            if args.write:
+                writer = batch.create_writer(os.path.join(workdir, 'bench.gpkg'), QgsCoordinateReferenceSystem('EPSG:28992'))
+                fields = batch.spec_fields()
+
+            start = time.perf_counter()
+            for chunk, wkbs in batch.wkb_chunks(specs(kernel, args.shapes, args.chunk_size), workers):
+                if args.write:
+                    writer.addFeatures(batch.spec_features(chunk, wkbs, fields), QgsFeatureSink.Flag.FastInsert)
+            if args.write:
+                del writer
+            elapsed = time.perf_counter() - start
+
+        baseline = baseline or elapsed
+        print('{:>8} {:>12.3f} {:>16.0f} {:>7.2f}x'.format(workers, elapsed, args.shapes / elapsed, baseline / elapsed))
+
+    if args.write:
+        app.exitQgis()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+ Counts the map render jobs that are started for a cancel and a create cycle of the
+ rectangle tool, on a canvas with a number of (memory) layers. A cancel should start no render
+ job, a create one, to draw the new feature.
+
+ Run with the Python interpreter that ships with QGIS:
+     QT_QPA_PLATFORM=offscreen python benchmarks/bench_refresh.py --layers 25
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+from qgis.PyQt.QtCore import QEventLoop, QTimer
+from qgis.core import QgsApplication, QgsPointXY, QgsProject, QgsRectangle, QgsVectorLayer
+from qgis.gui import QgsMapCanvas
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait(milliseconds=250):
+    loop = QEventLoop()
+    QTimer.singleShot(milliseconds, loop.quit)
+    loop.exec()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--layers', type=int, default=25)
+    parser.add_argument('--cycles', type=int, default=10)
+    args = parser.parse_args()
+
+    app = QgsApplication([], True)
+    app.initQgis()
+
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    tools = importlib.import_module(os.path.basename(PLUGIN_DIR) + '.geometry_shapes_tools')
+
+    layers = [QgsVectorLayer('Polygon?crs=EPSG:28992', 'layer {}'.format(i), 'memory') for i in range(args.layers)]
+    QgsProject.instance().setCrs(layers[0].crs())
+    QgsProject.instance().addMapLayers(layers)
+    target = layers[0]
+    target.startEditing()
+
+    canvas = QgsMapCanvas()
+    canvas.resize(800, 600)
+    canvas.setDestinationCrs(target.crs())
+    canvas.setLayers(layers)
+    canvas.setExtent(QgsRectangle(0, 0, 1000, 1000))
+    canvas.setCurrentLayer(target)
+    canvas.show()
+    wait()
+
+    jobs = []
+    canvas.renderStarting.connect(lambda: jobs.append(time.perf_counter()))
+    tool = tools.RectangleGeometryTool(canvas)
+
+    def cycle(commit):
+        del jobs[:]
+        tool.start_capturing()
+        tool.startPoint = QgsPointXY(100, 100)
+        tool.endPoint = QgsPointXY(200, 150)
+        tool.show_rubberband()
+        if commit:
+            tool.add_feature_to_layer()
+        else:
+            tool.reset()
+        wait()
+        return len(jobs)
+
+    for name, commit in (('cancel', False), ('create', True)):
+        counts = [cycle(commit) for _ in range(args.cycles)]
+        print('{:>8}: {:.2f} render jobs per cycle ({} cycles)'.format(name, sum(counts) / len(counts), len(counts)))
+
+    target.rollBack()
+    app.exitQgis()
+
+
+if __name__ == '__main__':
+    main()
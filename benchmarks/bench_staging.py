@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+ Compares adding shapes one by one to a GeoPackage layer, as the map tools do without staging,
+ with staging them in a memory layer and flushing them in one transaction. Both include the
+ commit to the GeoPackage.
+
+ Run with the Python interpreter that ships with QGIS:
+     python benchmarks/bench_staging.py --shapes 1000 5000
+"""
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+
+from qgis.core import QgsApplication, QgsFeature, QgsGeometry, QgsProject
+
+from bench_tools import polygon_layer
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def shapes(kernel, count):
+    """Returns the WKB of a grid of rotated ovals"""
+    side = int(count ** 0.5) + 1
+    xs, ys = kernel.grid_centers(0, 0, 20.0, 20.0, side, side)
+    return kernel.shapes_wkb(kernel.OVAL, xs[:count], ys[:count], 8.0, 5.0, 30.0, 50)
+
+
+def features(layer, wkbs):
+    for wkb in wkbs:
+        geometry = QgsGeometry()
+        geometry.fromWkb(wkb)
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(geometry)
+        yield feature
+
+
+def per_feature(layer, wkbs):
+    """One edit command per shape, like the draw and stamp tools, then one commit"""
+    start = time.perf_counter()
+    for feature in features(layer, wkbs):
+        layer.beginEditCommand('Add feature')
+        layer.addFeature(feature)
+        layer.endEditCommand()
+    added = time.perf_counter() - start
+    layer.commitChanges()
+    return added, time.perf_counter() - start - added
+
+
+def staged(staging, layer, wkbs):
+    """Each shape staged on its own, then one flush"""
+    start = time.perf_counter()
+    for feature in features(layer, wkbs):
+        staging.add_features(layer, [feature])
+    added = time.perf_counter() - start
+    count, errors = staging.flush()
+    if errors:
+        raise IOError('\n'.join(errors))
+    return added, time.perf_counter() - start - added
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', type=int, nargs='+', default=[1000, 5000])
+    args = parser.parse_args()
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    package = os.path.basename(PLUGIN_DIR)
+    kernel = importlib.import_module(package + '.geometry_shapes_kernel')
+    staging = importlib.import_module(package + '.geometry_shapes_staging').staging()
+
+    print('{:>8} {:<12} {:>10} {:>10} {:>10} {:>10}'.format('shapes', 'path', 'add (s)', 'commit (s)', 'total (s)',
+                                                            'shapes/s'))
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in args.shapes:
+            wkbs = shapes(kernel, count)
+            for name in ('per feature', 'staged'):
+                path = os.path.join(workdir, '{}-{}.gpkg'.format(name.replace(' ', '_'), count))
+                layer = polygon_layer('shapes', 'EPSG:28992', fields=True, path=path)
+                if name == 'per feature':
+                    added, committed = per_feature(layer, wkbs)
+                else:
+                    added, committed = staged(staging, layer, wkbs)
+                assert layer.featureCount() == count
+                total = added + committed
+                print('{:>8} {:<12} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.0f}'.format(
+                    count, name, added, committed, total, count / total))
+                QgsProject.instance().removeAllMapLayers()
+
+    app.exitQgis()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+ Measures what the plugin adds to the QGIS startup: importing the package, classFactory and
+ initGui, and the first activation of a tool. Each run is a fresh Python process, so no module
+ or form caches hide the import cost. Compare versions by pointing --plugin-dir to a checkout
+ of an older version.
+
+ Run with the Python interpreter that ships with QGIS:
+     QT_QPA_PLATFORM=offscreen python benchmarks/bench_startup.py --runs 20
+     QT_QPA_PLATFORM=offscreen python benchmarks/bench_startup.py --plugin-dir /tmp/GeometryShapes-1.2
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ('import', 'class_factory', 'init_gui', 'first_activation')
+
+
+def child(plugin_dir):
+    """Loads the plugin once in this process and prints the timings of each stage as JSON"""
+    from qgis.PyQt.QtCore import QObject, pyqtSignal
+    from qgis.PyQt.QtWidgets import QAction, QMainWindow, QToolBar
+    from qgis.core import QgsApplication, QgsMapLayer
+    from qgis.gui import QgsMapCanvas, QgsMessageBar
+
+    class FakeInterface(QObject):
+        """Stand-in for the parts of QgisInterface that are used when the plugin is loaded"""
+        currentLayerChanged = pyqtSignal(QgsMapLayer)
+        optionsChanged = pyqtSignal()
+
+        def __init__(self, canvas):
+            super(FakeInterface, self).__init__()
+            self.canvas = canvas
+            self.window = QMainWindow()
+            self.bar = QgsMessageBar()
+            self.toolbar = QToolBar()
+            for i in range(6):
+                self.toolbar.addAction(QAction('action {}'.format(i), self.toolbar))
+
+        def mapCanvas(self):
+            return self.canvas
+
+        def mainWindow(self):
+            return self.window
+
+        def messageBar(self):
+            return self.bar
+
+        def digitizeToolBar(self):
+            return self.toolbar
+
+        def addPluginToVectorMenu(self, menu, action):
+            pass
+
+        def removePluginVectorMenu(self, menu, action):
+            pass
+
+    app = QgsApplication([], True)
+    app.initQgis()
+    canvas = QgsMapCanvas()
+    iface = FakeInterface(canvas)
+    import qgis.utils
+    qgis.utils.iface = iface
+
+    timings = {}
+    sys.path.insert(0, os.path.dirname(plugin_dir))
+    start = time.perf_counter()
+    package = importlib.import_module(os.path.basename(plugin_dir))
+    timings['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plugin = package.classFactory(iface)
+    timings['class_factory'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plugin.initGui()
+    timings['init_gui'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plugin.set_tool(True, 1)
+    timings['first_activation'] = time.perf_counter() - start
+
+    plugin.set_tool(False, 1)
+    plugin.unload()
+    print(json.dumps({stage: seconds * 1000 for stage, seconds in timings.items()}))
+    sys.stdout.flush()
+    # skip the teardown of QGIS, it is not part of the measurement
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--plugin-dir', default=PLUGIN_DIR, help='directory of the plugin to load')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    plugin_dir = os.path.abspath(args.plugin_dir)
+    if args.child:
+        child(plugin_dir)
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', '--plugin-dir', plugin_dir],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = {}
+    print('{:<20} {:>12} {:>12} {:>12}'.format('stage', 'median (ms)', 'min (ms)', 'max (ms)'))
+    for stage in STAGES + ('startup',):
+        if stage == 'startup':
+            # what is paid when QGIS starts, the first activation is paid when the tool is used
+            values = [sum(run[s] for s in STAGES if s != 'first_activation') for run in runs]
+        else:
+            values = [run[stage] for run in runs]
+        results[stage] = {'median_ms': statistics.median(values), 'min_ms': min(values), 'max_ms': max(values)}
+        print('{:<20} {:>12.2f} {:>12.2f} {:>12.2f}'.format(stage, *results[stage].values()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'plugin_dir': plugin_dir, 'runs': args.runs, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+ Times the hot paths of the map tools on an offscreen canvas, with a stand-in for the
+ QGIS interface, and stores the results as JSON to compare plugin versions.
+
+ Run with the Python interpreter that ships with QGIS:
+     QT_QPA_PLATFORM=offscreen python benchmarks/bench_tools.py --output bench_tools.json
+     QT_QPA_PLATFORM=offscreen python benchmarks/bench_tools.py --baseline bench_tools.json
+"""
+import argparse
+import configparser
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from qgis.PyQt.QtCore import QObject, QPoint, pyqtSignal
+from qgis.PyQt.QtWidgets import QMainWindow
+from qgis.core import Qgis, QgsApplication, QgsCoordinateReferenceSystem, QgsFeature, QgsGeometry, QgsPointXY, \
+    QgsProject, QgsRectangle, QgsVectorFileWriter, QgsVectorLayer
+from qgis.gui import QgsMapCanvas, QgsMessageBar
+import qgis.utils
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeFeatureForm(QObject):
+    """Stand-in for the feature form: adds the feature right away, like accepting the form"""
+    accepted = pyqtSignal()
+    rejected = pyqtSignal()
+
+    def __init__(self, layer, feature):
+        super(FakeFeatureForm, self).__init__()
+        self.layer = layer
+        self.feature = feature
+
+    def setMode(self, mode):
+        pass
+
+    def show(self):
+        self.layer.addFeature(self.feature)
+        self.accepted.emit()
+
+
+class FakeInterface:
+    """Stand-in for the parts of QgisInterface that are used by the map tools"""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.window = QMainWindow()
+        self.bar = QgsMessageBar()
+        self.forms = []
+
+    def mapCanvas(self):
+        return self.canvas
+
+    def mainWindow(self):
+        return self.window
+
+    def messageBar(self):
+        return self.bar
+
+    def getFeatureForm(self, layer, feature):
+        form = FakeFeatureForm(layer, feature)
+        # keep the form alive until it has been shown, like the real (parented) form
+        self.forms.append(form)
+        return form
+
+
+def plugin_version():
+    metadata = configparser.ConfigParser()
+    metadata.read(os.path.join(PLUGIN_DIR, 'metadata.txt'))
+    return metadata.get('general', 'version', fallback='unknown')
+
+
+def measure(name, function, iterations, setup=None):
+    """Calls the function a number of times and returns the statistics of the wall times in microseconds"""
+    times = []
+    for i in range(iterations):
+        if setup is not None:
+            setup(i)
+        start = time.perf_counter()
+        function(i)
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    result = {
+        'name': name,
+        'iterations': iterations,
+        'total_s': sum(times) / 1e6,
+        'mean_us': statistics.mean(times),
+        'median_us': statistics.median(times),
+        'p95_us': times[min(len(times) - 1, int(len(times) * 0.95))],
+        'min_us': times[0],
+    }
+    print('{:<48} {:>12.1f} {:>12.1f} {:>12.1f}'.format(name, result['median_us'], result['p95_us'], result['mean_us']))
+    return result
+
+
+def polygon_layer(name, crs, fields=False, path=None):
+    """Returns an editable memory layer, or a GeoPackage layer when a path is given"""
+    uri = 'Polygon?crs={}'.format(crs) + ('&field=name:string(20)' if fields else '')
+    layer = QgsVectorLayer(uri, name, 'memory')
+    if path is not None:
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = 'GPKG'
+        options.layerName = name
+        if os.path.exists(path):
+            options.actionOnExistingFile = QgsVectorFileWriter.ActionOnExistingFile.CreateOrOverwriteLayer
+        context = QgsProject.instance().transformContext()
+        if hasattr(QgsVectorFileWriter, 'writeAsVectorFormatV3'):
+            QgsVectorFileWriter.writeAsVectorFormatV3(layer, path, context, options)
+        else:
+            QgsVectorFileWriter.writeAsVectorFormatV2(layer, path, context, options)
+        layer = QgsVectorLayer('{}|layername={}'.format(path, name), name, 'ogr')
+    QgsProject.instance().addMapLayer(layer)
+    layer.startEditing()
+    return layer
+
+
+def fill_layer(layer, count, size=1000.0):
+    """Adds a grid of squares to the layer, to have neighbours for avoid intersections"""
+    side = int(count ** 0.5) or 1
+    step = size / side
+    features = []
+    for i in range(count):
+        feature = QgsFeature(layer.fields())
+        x = (i % side) * step
+        y = (i // side) * step
+        feature.setGeometry(QgsGeometry.fromRect(QgsRectangle(x, y, x + step * 0.8, y + step * 0.8)))
+        features.append(feature)
+    layer.addFeatures(features)
+
+
+def run(tools, canvas, iterations, workdir):
+    results = []
+    project = QgsProject.instance()
+
+    oval = tools.OvalGeometryTool(canvas)
+    rectangle = tools.RectangleGeometryTool(canvas)
+
+    def draw(tool, i=0):
+        # a slightly different shape for each iteration, so no cache can hide the work
+        tool.startPoint = QgsPointXY(500, 500)
+        tool.endPoint = QgsPointXY(550 + i % 50, 530 + i % 30)
+
+    target = polygon_layer('target', 'EPSG:28992')
+    canvas.setCurrentLayer(target)
+
+    for tool in (oval, rectangle):
+        name = tool.__class__.__name__
+        draw(tool)
+        results.append(measure('{}.geometry'.format(name), lambda i: tool.geometry(seg=50), iterations,
+                               lambda i: draw(tool, i)))
+
+        tool.start_capturing()
+        results.append(measure('{}.show_rubberband'.format(name), lambda i: tool.show_rubberband(), iterations,
+                               lambda i: draw(tool, i)))
+        results.append(measure('{}.capture_position'.format(name),
+                               lambda i: tool.capture_position(QPoint(400 + i % 100, 300 + i % 70)), iterations))
+        tool.reset()
+
+    # the output geometry of a shape: same CRS, other CRS, and with avoid intersections against a filled layer;
+    # the names are those of the results of earlier versions, which measured transformed_geometry, so they compare
+    other = polygon_layer('other crs', 'EPSG:4326')
+    for name, layer in (('same crs', target), ('crs change', other)):
+        canvas.setCurrentLayer(layer)
+        results.append(measure('OvalGeometryTool.transformed_geometry ({})'.format(name),
+                               lambda i: oval.shape_geometry(layer), iterations,
+                               lambda i: draw(oval, i)))
+
+    # avoid intersections is the work of the clip task of a committed shape
+    cache = importlib.import_module(tools.__package__ + '.geometry_shapes_cache')
+    neighbours = polygon_layer('neighbours', 'EPSG:28992')
+    fill_layer(neighbours, 10000)
+    canvas.setCurrentLayer(neighbours)
+    results.append(measure('OvalGeometryTool.transformed_geometry (avoid intersections)',
+                           lambda i: cache.avoid_intersections(oval.shape_geometry(neighbours), neighbours,
+                                                               [neighbours]), iterations,
+                           lambda i: draw(oval, i)))
+
+    # adding features without attributes, and with attributes through the feature form
+    gpkg = os.path.join(workdir, 'bench_tools.gpkg')
+    for name, path in (('memory', None), ('gpkg', gpkg)):
+        for fields in (False, True):
+            layer = polygon_layer('{} {}'.format(name, 'fields' if fields else 'geometry'), 'EPSG:28992', fields,
+                                  path)
+            canvas.setCurrentLayer(layer)
+
+            def setup(i):
+                oval.start_capturing()
+                draw(oval, i)
+
+            results.append(measure('OvalGeometryTool.add_feature_to_layer ({}, {})'.format(
+                name, 'fields' if fields else 'no fields'), lambda i: oval.add_feature_to_layer(), iterations, setup))
+            layer.rollBack()
+
+    project.removeAllMapLayers()
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Prints the benchmarks that are slower than the baseline and returns their count"""
+    with open(baseline_path) as f:
+        baseline = {result['name']: result for result in json.load(f)['results']}
+    regressions = 0
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None or not old['median_us']:
+            print('NOT IN BASELINE {:<43}'.format(result['name']))
+            continue
+        change = (result['median_us'] - old['median_us']) / old['median_us'] * 100
+        if change > threshold:
+            regressions += 1
+            print('REGRESSION {:<48} {:>+8.1f}%'.format(result['name'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the median times with the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help='percentage a median may be slower than the baseline (default 20)')
+    args = parser.parse_args()
+
+    app = QgsApplication([], True)
+    app.initQgis()
+
+    canvas = QgsMapCanvas()
+    canvas.resize(800, 600)
+    crs = QgsCoordinateReferenceSystem('EPSG:28992')
+    QgsProject.instance().setCrs(crs)
+    canvas.setDestinationCrs(crs)
+    canvas.setExtent(QgsRectangle(0, 0, 1000, 1000))
+    canvas.show()
+
+    # the tools look up the interface in qgis.utils when they need it, e.g. for the feature form
+    qgis.utils.iface = FakeInterface(canvas)
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    tools = importlib.import_module(os.path.basename(PLUGIN_DIR) + '.geometry_shapes_tools')
+
+    print('{:<48} {:>12} {:>12} {:>12}'.format('benchmark', 'median (us)', 'p95 (us)', 'mean (us)'))
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(tools, canvas, args.iterations, workdir)
+
+    report = {
+        'plugin_version': plugin_version(),
+        'qgis_version': Qgis.version(),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'iterations': args.iterations,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    regressions = compare(results, args.baseline, args.threshold) if args.baseline else 0
+    app.exitQgis()
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
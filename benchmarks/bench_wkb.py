@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+ Compares building shapes through QgsPointXY lists (fromPolygonXY/fromRect)
+ with packing the rings into WKB and creating the geometry with fromWkb.
+
+ Run with the Python interpreter that ships with QGIS:
+     python benchmarks/bench_wkb.py --sizes 10000 100000 1000000
+"""
+import argparse
+import importlib
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from qgis.core import QgsGeometry, QgsPointXY, QgsRectangle
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import as a package, the kernel imports its constants relative to the plugin
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+kernel = importlib.import_module(os.path.basename(PLUGIN_DIR) + '.geometry_shapes_kernel')
+ovals_coords, polygons_wkb, rectangles_coords = kernel.ovals_coords, kernel.polygons_wkb, kernel.rectangles_coords
+
+
+def points_rectangles(x, y, w, h):
+    return [QgsGeometry.fromRect(QgsRectangle(x[i], y[i], x[i] + w[i], y[i] + h[i])) for i in range(len(x))]
+
+
+def points_ovals(x, y, w, h, segments):
+    geometries = []
+    for i in range(len(x)):
+        coords = []
+        for s in range(segments):
+            angle = s * 2 * math.pi / segments
+            coords.append(QgsPointXY(x[i] + w[i] * math.cos(angle), y[i] + h[i] * math.sin(angle)))
+        geometries.append(QgsGeometry.fromPolygonXY([coords]))
+    return geometries
+
+
+def from_wkb(wkbs):
+    geometries = []
+    for wkb in wkbs:
+        geometry = QgsGeometry()
+        geometry.fromWkb(wkb)
+        geometries.append(geometry)
+    return geometries
+
+
+def wkb_rectangles(x, y, w, h):
+    return from_wkb(polygons_wkb(rectangles_coords(x + w / 2, y + h / 2, w, h)))
+
+
+def wkb_ovals(x, y, w, h, segments):
+    return from_wkb(polygons_wkb(ovals_coords(x, y, w, h, segments)))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--segments', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print('{:>10} {:>10} {:>12} {:>12} {:>8}'.format('shapes', 'shape', 'points (s)', 'wkb (s)', 'speedup'))
+    for size in args.sizes:
+        x, y = rng.uniform(0, 100000, (2, size))
+        w, h = rng.uniform(1, 100, (2, size))
+        for name, old, new, extra in (('rectangle', points_rectangles, wkb_rectangles, ()),
+                                      ('oval', points_ovals, wkb_ovals, (args.segments,))):
+            t_old = timed(old, x, y, w, h, *extra)
+            t_new = timed(new, x, y, w, h, *extra)
+            print('{:>10} {:>10} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(size, name, t_old, t_new, t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -24,10 +24,9 @@ import os.path
 from qgis.PyQt.QtCore import QSettings, QLocale, QTranslator, qVersion, QCoreApplication
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QMenu, QToolButton
-from qgis.core import QgsMapLayer, QgsWkbTypes
+from qgis.core import QgsApplication, QgsMapLayer, QgsWkbTypes
 
-from .resources3 import *
-from .geometry_shapes_tools import RectangleGeometryTool, OvalGeometryTool
+from .geometry_shapes_processing import GeometryShapesProvider
 
 GeometryType = QgsWkbTypes.GeometryType
 
@@ -43,9 +42,9 @@ class GeometryShapes:
             application at run time.
         :type iface: QgisInterface
         """
-        # Save reference to the QGIS interface
+        # Save reference to the QGIS interface, there is none when run from qgis_process
         self.iface = iface
-        self.canvas = iface.mapCanvas()
+        self.canvas = None
 
         # initialize plugin directory
         self.plugin_dir = os.path.dirname(__file__)
@@ -66,17 +65,17 @@ class GeometryShapes:
         # Declare instance attributes
         self.actions = []
         self.menu = self.tr(u'&Geometry Shapes')
-        self.toolbar = self.iface.digitizeToolBar()
-        self.popupMenu = QMenu()
-        self.toolButton = QToolButton()
+        self.toolbar = None
+        self.popupMenu = None
+        self.toolButton = None
         self.toolButtonAction = None
+        self.provider = None
+        self.stagingAction = None
+        self.flushAction = None
 
         # Setup map tools
         self.tool = None
-        self.rectTool = None
-        self.ovalTool = None
-
-        self.iface.currentLayerChanged["QgsMapLayer*"].connect(self.toggle)
+        self.tools = []
 
     # noinspection PyMethodMayBeStatic
     def tr(self, message):
@@ -178,8 +177,25 @@ class GeometryShapes:
         self.actions.append(action)
         return action
 
+    def initProcessing(self):
+        """Register the processing provider, also called by qgis_process without a GUI."""
+        if self.provider is None:
+            self.provider = GeometryShapesProvider()
+            QgsApplication.processingRegistry().addProvider(self.provider)
+
     def initGui(self):
         """Create the menu entries and toolbar icons inside the QGIS GUI."""
+        self.initProcessing()
+        # register the icons, only needed with a GUI
+        from . import resources3  # noqa: F401
+
+        self.canvas = self.iface.mapCanvas()
+        self.toolbar = self.iface.digitizeToolBar()
+        self.popupMenu = QMenu()
+        self.toolButton = QToolButton()
+        self.iface.currentLayerChanged["QgsMapLayer*"].connect(self.toggle)
+        self.iface.optionsChanged.connect(self.options_changed)
+
         icon_path = ':/plugins/GeometryShapes/mActionCapturePolygonRectangle.svg'
         self.add_action(
             icon_path,
@@ -198,16 +214,66 @@ class GeometryShapes:
             add_to_toolbar=False,
             parent=self.iface.mainWindow())
 
+        icon_path = ':/plugins/GeometryShapes/mActionCapturePolygonRectangle.svg'
+        self.add_action(
+            icon_path,
+            text=self.tr(u'Draw grid of rectangles'),
+            callback=lambda checked: self.set_tool(checked, 2),
+            enabled_flag=False,
+            add_to_toolbar=False,
+            parent=self.iface.mainWindow())
+
+        icon_path = ':/plugins/GeometryShapes/mActionCapturePolygonCircle.svg'
+        self.add_action(
+            icon_path,
+            text=self.tr(u'Draw grid of ovals'),
+            callback=lambda checked: self.set_tool(checked, 3),
+            enabled_flag=False,
+            add_to_toolbar=False,
+            parent=self.iface.mainWindow())
+
+        icon_path = ':/plugins/GeometryShapes/mActionCapturePolygonRectangle.svg'
+        self.add_action(
+            icon_path,
+            text=self.tr(u'Stamp rectangles'),
+            callback=lambda checked: self.set_tool(checked, 4),
+            enabled_flag=False,
+            add_to_toolbar=False,
+            parent=self.iface.mainWindow())
+
+        icon_path = ':/plugins/GeometryShapes/mActionCapturePolygonCircle.svg'
+        self.add_action(
+            icon_path,
+            text=self.tr(u'Stamp ovals'),
+            callback=lambda checked: self.set_tool(checked, 5),
+            enabled_flag=False,
+            add_to_toolbar=False,
+            parent=self.iface.mainWindow())
+
+        # staging of new shapes, not a map tool
+        self.stagingAction = QAction(self.tr(u'Stage new shapes'), self.iface.mainWindow())
+        self.stagingAction.setCheckable(True)
+        self.stagingAction.setChecked(QSettings().value('GeometryShapes/staging', False, type=bool))
+        self.stagingAction.setStatusTip(self.tr(u'Collect new shapes in a memory layer and save them at once'))
+        self.stagingAction.toggled.connect(self.set_staging)
+        self.flushAction = QAction(self.tr(u'Flush staged shapes'), self.iface.mainWindow())
+        self.flushAction.setStatusTip(self.tr(u'Add the staged shapes to their layers and save these layers'))
+        self.flushAction.triggered.connect(self.flush_staged)
+
         # Assemble popup button
-        self.popupMenu.addAction(self.actions[0])
-        self.popupMenu.addAction(self.actions[1])
+        for action in self.actions:
+            self.popupMenu.addAction(action)
+        self.popupMenu.addSeparator()
+        for action in (self.stagingAction, self.flushAction):
+            self.popupMenu.addAction(action)
+            self.iface.addPluginToVectorMenu(self.menu, action)
         self.toolButton.setMenu(self.popupMenu)
         self.toolButton.setDefaultAction(self.actions[0])
         self.toolButton.setPopupMode(QToolButton.ToolButtonPopupMode.MenuButtonPopup)
         self.toolButtonAction = self.toolbar.insertWidget(self.toolbar.actions()[4], self.toolButton)
 
-        self.rectangleTool = RectangleGeometryTool(self.canvas)
-        self.ovalTool = OvalGeometryTool(self.canvas)
+        # one tool per action, in the same order, created when the action is first used
+        self.tools = [None] * len(self.actions)
 
         # Init button state
         self.toggle()
@@ -218,15 +284,22 @@ class GeometryShapes:
             self.tool = None
             return
 
-        if action == 0:
-            self.tool = self.rectangleTool
-        else:
-            self.tool = self.ovalTool
+        if self.tools[action] is None:
+            self.tools[action] = self.create_tool(action)
+        self.tool = self.tools[action]
 
         self.toolButton.setDefaultAction(self.actions[action])
         self.tool.setAction(self.actions[action])
         self.canvas.setMapTool(self.tool)
 
+    def create_tool(self, action):
+        """Creates the map tool of an action, the tools module is only imported when a tool is first used"""
+        from .geometry_shapes_tools import MODE_DRAW, MODE_GRID, MODE_STAMP, RectangleGeometryTool, OvalGeometryTool
+
+        tool_class = (RectangleGeometryTool, OvalGeometryTool)[action % 2]
+        mode = (MODE_DRAW, MODE_GRID, MODE_STAMP)[action // 2]
+        return tool_class(self.canvas, mode)
+
     # Some code here lifted from: https://gitlab.com/lbartoletti/CADDigitize/blob/master/CADDigitize.py
     # and copyright 2016 by Loïc BARTOLETTI
     def toggle(self):
@@ -234,8 +307,7 @@ class GeometryShapes:
 
         # Decide whether the plugin button/menu is enabled or disabled
         if layer is None:
-            self.actions[0].setEnabled(False)
-            self.actions[1].setEnabled(False)
+            self.set_actions_enabled(False)
         else:
             try:
                 # disconnect, will be reconnected
@@ -253,23 +325,59 @@ class GeometryShapes:
                 layer.editingStopped.connect(self.toggle)
 
             if layer.type() == QgsMapLayer.LayerType.VectorLayer and layer.geometryType() == GeometryType.PolygonGeometry and layer.isEditable() and layer.isValid():
-                self.actions[0].setEnabled(True)
-                self.actions[1].setEnabled(True)
+                self.set_actions_enabled(True)
             else:
-                self.actions[0].setEnabled(False)
-                self.actions[1].setEnabled(False)
+                self.set_actions_enabled(False)
+
+    def options_changed(self):
+        """Reloads the digitizing style of the previews after the QGIS options have been changed"""
+        from .geometry_shapes_canvas_item import preview_style
+        preview_style().load()
+
+    def set_staging(self, checked):
+        from .geometry_shapes_staging import staging
+        staging().set_enabled(checked)
+
+    def flush_staged(self):
+        """Adds the staged shapes to their layers in one transaction per layer"""
+        from .geometry_shapes_staging import staging
+        count, errors = staging().flush()
+        if errors:
+            self.iface.messageBar().pushWarning(self.tr(u'Flush staged shapes'), '\n'.join(errors))
+        else:
+            self.iface.messageBar().pushInfo(self.tr(u'Flush staged shapes'),
+                                             self.tr(u'{} shapes saved').format(count))
+
+    def set_actions_enabled(self, enabled):
+        for action in self.actions:
+            action.setEnabled(enabled)
 
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
-        for action in self.actions:
+        if self.provider is not None:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
+        if self.canvas is None:
+            # the GUI was never initialized, e.g. in qgis_process
+            return
+
+        for action in self.actions + [self.stagingAction, self.flushAction]:
             self.iface.removePluginVectorMenu(self.tr(u'&Geometry Shapes'), action)
             try:
                 action.triggered.disconnect()
             except (TypeError, AttributeError):
                 pass
+        try:
+            self.stagingAction.toggled.disconnect(self.set_staging)
+        except (TypeError, AttributeError):
+            pass
 
         self.popupMenu.clear()
         self.toolbar.removeAction(self.toolButtonAction)
+        try:
+            self.iface.optionsChanged.disconnect(self.options_changed)
+        except (TypeError, AttributeError):
+            pass
 
         layer = self.canvas.currentLayer()
         if layer:
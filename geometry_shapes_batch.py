@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Headless generation of shapes from a spec file into a GeoPackage, without iface or canvas.
+ The spec file is read and written in chunks, so memory use does not grow with the input.
+
+ A CSV spec has a header with the columns x, y, width, height (or rx, ry for ovals) and the
+ optional columns shape (rectangle or oval), rotation (clockwise degrees) and segments.
+ A GeoJSON-lines spec has one point feature per line, with the same names as properties.
+
+     python -m GeometryShapes.geometry_shapes_batch shapes.csv shapes.gpkg --crs EPSG:28992
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# QGIS is imported by the functions that write the output: the workers of the process pool import this
+# module as well, also as __mp_main__ when it is run with -m, and only need the kernel
+from .geometry_shapes_kernel import OVAL, RECTANGLE, spec_array, spec_array_wkb
+
+# number of shapes that are read, built and written at once
+CHUNK_SIZE = 10000
+
+SHAPES = {'rectangle': RECTANGLE, 'oval': OVAL}
+SHAPE_NAMES = {RECTANGLE: 'rectangle', OVAL: 'oval'}
+
+
+def spec_fields():
+    """
+    Returns the fields of the output layer: the line number of the spec and the shape
+
+    :rtype: qgis.core.QgsFields
+    """
+    from qgis.PyQt.QtCore import QMetaType, QVariant
+    from qgis.core import Qgis, QgsField, QgsFields
+
+    fields = QgsFields()
+    if Qgis.versionInt() < 33800:
+        fields.append(QgsField('line', QVariant.Int))
+        fields.append(QgsField('shape', QVariant.String))
+    else:
+        fields.append(QgsField('line', QMetaType.Type.Int))
+        fields.append(QgsField('shape', QMetaType.Type.QString))
+    return fields
+
+
+def first_value(values, *names):
+    """Returns the first value of the names that is not missing or empty, or None"""
+    for name in names:
+        value = values.get(name)
+        if value is not None and value != '':
+            return value
+    return None
+
+
+def spec_record(values, line, shape, segments):
+    """
+    Returns a tuple (line, shape, x, y, width, height, rotation, segments) from the values of one spec,
+    in the field order of a shape record
+
+    :param values: mapping of names to values, e.g. a CSV row or the properties of a feature
+    :param line: line number of the spec in the file
+    :param shape: default shape if the spec has none
+    :param segments: default number of segments if the spec has none
+    :rtype: tuple
+    :raises ValueError: if the spec is invalid, with the line number
+    """
+    try:
+        shape = SHAPES[str(values.get('shape') or SHAPE_NAMES[shape]).lower()]
+        # a CSV with both width and rx columns has empty values in the column that is not used
+        width = first_value(values, 'width', 'rx')
+        height = first_value(values, 'height', 'ry')
+        return (line, shape, float(values['x']), float(values['y']), float(width), float(height),
+                float(values.get('rotation') or 0), int(values.get('segments') or segments))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError('line {}: invalid spec: {}'.format(line, e))
+
+
+def read_csv(f, shape, segments):
+    for line, row in enumerate(csv.DictReader(f), 2):
+        yield spec_record(row, line, shape, segments)
+
+
+def read_geojsonl(f, shape, segments):
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        feature = json.loads(text)
+        values = dict(feature.get('properties') or {})
+        geometry = feature.get('geometry')
+        if geometry:
+            values['x'], values['y'] = geometry['coordinates'][:2]
+        yield spec_record(values, line, shape, segments)
+
+
+def read_specs(path, shape=RECTANGLE, segments=50, chunk_size=CHUNK_SIZE):
+    """
+    Reads a CSV or GeoJSON-lines spec file and yields the specs in chunks, each chunk is an array of
+    shape records (see SPEC_DTYPE) with the line number of the spec as id
+
+    :param path: spec file, GeoJSON-lines if it ends with .geojsonl, .geojsons, .jsonl or .ndjson
+    :param shape: RECTANGLE or OVAL, for specs without shape
+    :param segments: number of segments of ovals, for specs without segments
+    :rtype: collections.abc.Iterator[numpy.ndarray]
+    """
+    json_lines = os.path.splitext(path)[1].lower() in ('.geojsonl', '.geojsons', '.jsonl', '.ndjson')
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = read_geojsonl(f, shape, segments) if json_lines else read_csv(f, shape, segments)
+        chunk = spec_array(chunk_size)
+        count = 0
+        for record in reader:
+            chunk[count] = record
+            count += 1
+            if count == chunk_size:
+                yield chunk
+                chunk = spec_array(chunk_size)
+                count = 0
+        if count:
+            yield chunk[:count]
+
+
+def wkb_chunks(chunks, workers=1):
+    """
+    Builds the WKB of chunks of specs and yields (chunk, wkbs) in input order. With more than one
+    worker the chunks are built in a process pool; at most two chunks per worker are in flight,
+    so memory use stays flat while a single writer consumes the results.
+
+    :param chunks: iterable of arrays of shape records, e.g. from read_specs
+    :param workers: number of worker processes, 1 builds the chunks in this process
+    :rtype: collections.abc.Iterator[(numpy.ndarray, list[bytes])]
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, spec_array_wkb(chunk)
+        return
+
+    # spawn, a forked copy of a process with a running QgsApplication is not safe
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(spec_array_wkb, chunk)))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+
+def spec_features(chunk, wkbs, fields):
+    """
+    Returns the output features of a chunk of specs and their WKB
+
+    :param chunk: array of shape records
+    :type wkbs: list[bytes]
+    :type fields: qgis.core.QgsFields
+    :rtype: list[qgis.core.QgsFeature]
+    """
+    from qgis.core import QgsFeature, QgsGeometry
+
+    features = []
+    for line, shape, wkb in zip(chunk['id'].tolist(), chunk['shape'].tolist(), wkbs):
+        geometry = QgsGeometry()
+        geometry.fromWkb(wkb)
+        feature = QgsFeature(fields)
+        feature.setAttributes([line, SHAPE_NAMES[shape]])
+        feature.setGeometry(geometry)
+        features.append(feature)
+    return features
+
+
+def create_writer(path, crs, layer_name=None):
+    """
+    Returns a writer for a new GeoPackage with the output fields and polygon geometries
+
+    :type path: str
+    :type crs: qgis.core.QgsCoordinateReferenceSystem
+    :rtype: qgis.core.QgsVectorFileWriter
+    """
+    from qgis.core import Qgis, QgsCoordinateTransformContext, QgsVectorFileWriter, QgsWkbTypes
+
+    WkbType = QgsWkbTypes.Type if Qgis.versionInt() < 33000 else Qgis.WkbType
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = 'GPKG'
+    options.layerName = layer_name or os.path.splitext(os.path.basename(path))[0]
+    if Qgis.versionInt() < 31000:
+        writer = QgsVectorFileWriter(path, 'UTF-8', spec_fields(), WkbType.Polygon, crs, 'GPKG')
+    else:
+        writer = QgsVectorFileWriter.create(path, spec_fields(), WkbType.Polygon, crs,
+                                            QgsCoordinateTransformContext(), options)
+    if writer.hasError() != QgsVectorFileWriter.WriterError.NoError:
+        raise IOError(writer.errorMessage())
+    return writer
+
+
+def generate(spec_path, output_path, crs, shape=RECTANGLE, segments=50, chunk_size=CHUNK_SIZE, feedback=None,
+             workers=1, output_crs=None):
+    """
+    Generates the shapes of a spec file into a GeoPackage, chunk by chunk
+
+    :param spec_path: CSV or GeoJSON-lines spec file
+    :param output_path: GeoPackage to create
+    :type crs: qgis.core.QgsCoordinateReferenceSystem
+    :param shape: RECTANGLE or OVAL, for specs without shape
+    :param segments: number of segments of ovals, for specs without segments
+    :param feedback: optional function that takes the number of shapes written so far
+    :param workers: number of processes that build the shapes, the file is written by this process
+    :param output_crs: CRS of the output if it differs from the CRS of the spec coordinates
+    :type output_crs: qgis.core.QgsCoordinateReferenceSystem
+    :return: number of shapes written
+    :rtype: int
+    """
+    from qgis.core import QgsCoordinateTransform, QgsCoordinateTransformContext, QgsFeatureSink
+    from .geometry_shapes_cache import transform_polygons_wkb
+
+    transform = None
+    if output_crs is not None and output_crs != crs:
+        transform = QgsCoordinateTransform(crs, output_crs, QgsCoordinateTransformContext())
+    writer = create_writer(output_path, output_crs or crs)
+    fields = spec_fields()
+    count = 0
+    try:
+        for chunk, wkbs in wkb_chunks(read_specs(spec_path, shape, segments, chunk_size), workers):
+            if transform is not None:
+                wkbs = transform_polygons_wkb(wkbs, transform)
+            features = spec_features(chunk, wkbs, fields)
+            if not writer.addFeatures(features, QgsFeatureSink.Flag.FastInsert):
+                raise IOError(writer.errorMessage())
+            count += len(features)
+            if feedback is not None:
+                feedback(count)
+    finally:
+        # closes the file
+        del writer
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('spec', help='CSV or GeoJSON-lines spec file')
+    parser.add_argument('output', help='GeoPackage to create')
+    parser.add_argument('--crs', default='EPSG:4326', help='CRS of the spec coordinates and the output')
+    parser.add_argument('--output-crs', help='reproject the output to this CRS')
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='rectangle', help='shape of specs without shape')
+    parser.add_argument('--segments', type=int, default=50, help='segments of ovals without segments')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes that build the shapes, 0 for one per CPU (default 1)')
+    args = parser.parse_args()
+
+    from qgis.core import QgsApplication, QgsCoordinateReferenceSystem
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        count = generate(args.spec, args.output, QgsCoordinateReferenceSystem(args.crs), SHAPES[args.shape],
+                         args.segments, args.chunk_size, lambda n: print('{} shapes'.format(n), end='\r'),
+                         args.workers or os.cpu_count(),
+                         QgsCoordinateReferenceSystem(args.output_crs) if args.output_crs else None)
+        print('{} shapes written to {}'.format(count, args.output))
+    except ValueError as e:
+        parser.exit(1, 'error: {}\n'.format(e))
+    finally:
+        app.exitQgis()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Caches for objects that are expensive to set up and are needed for every
+ feature that is added to a layer.
+"""
+import struct
+
+import numpy as np
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import Qgis, QgsCoordinateTransform, QgsExpression, QgsFeature, QgsFeatureRequest, QgsGeometry, \
+    QgsMapLayer, QgsMessageLog, QgsProject, QgsSpatialIndex, QgsWkbTypes
+
+from .geometry_shapes_kernel import POLYGON_HEADER_SIZE, WKB_LINESTRING, WKB_LITTLE_ENDIAN
+
+
+def tr(message):
+    return QCoreApplication.translate('GeometryShapes', message)
+
+
+def is_polygon_layer(layer):
+    """Returns True if the layer is a polygon vector layer, e.g. not a raster layer or None"""
+    return (layer is not None and layer.type() == QgsMapLayer.LayerType.VectorLayer
+            and layer.geometryType() == QgsWkbTypes.GeometryType.PolygonGeometry)
+
+
+def crs_key(crs):
+    """Returns a hashable key for a QgsCoordinateReferenceSystem"""
+    return crs.authid() or crs.toWkt()
+
+
+class TransformCache:
+    """
+    Keeps the coordinate transforms (and with it the prepared PROJ pipelines) per source/target CRS.
+    The cache is cleared when the project CRS or transform context or the CRS of a layer changes.
+    """
+
+    def __init__(self, project):
+        self.project = project
+        self.transforms = {}
+        self.layerIds = set()
+        self.hits = 0
+        self.misses = 0
+
+        project.crsChanged.connect(self.clear)
+        project.transformContextChanged.connect(self.clear)
+
+    def transform(self, source_crs, layer):
+        """
+        Returns the transform from the source CRS to the CRS of the layer
+
+        :type source_crs: qgis.core.QgsCoordinateReferenceSystem
+        :type layer: qgis.core.QgsMapLayer
+        :rtype: qgis.core.QgsCoordinateTransform
+        """
+        key = (crs_key(source_crs), crs_key(layer.crs()))
+        transform = self.transforms.get(key)
+        if transform is not None:
+            self.hits += 1
+            return transform
+
+        self.misses += 1
+        if layer.id() not in self.layerIds:
+            layer.crsChanged.connect(self.clear)
+            self.layerIds.add(layer.id())
+        transform = QgsCoordinateTransform(source_crs, layer.crs(), self.project.transformContext())
+        self.transforms[key] = transform
+        return transform
+
+    def clear(self):
+        self.transforms.clear()
+
+    def reset_statistics(self):
+        self.hits = 0
+        self.misses = 0
+
+
+def transform_polygons_wkb(wkbs, transform):
+    """
+    Transforms many single ring polygons at once. The coordinates of all polygons are gathered into
+    one contiguous array and transformed with a single call as one line string, so the coordinate
+    transform runs once per chunk instead of once per shape. The result is split back into records.
+
+    :param wkbs: polygon WKB as built by the shape kernel, little endian with one ring
+    :type wkbs: list[bytes]
+    :type transform: qgis.core.QgsCoordinateTransform
+    :rtype: list[bytes]
+    """
+    if not wkbs:
+        return []
+    sizes = np.fromiter(map(len, wkbs), dtype=np.int64, count=len(wkbs))
+    offsets = np.zeros(len(wkbs), dtype=np.int64)
+    np.cumsum(sizes[:-1], out=offsets[1:])
+    data = np.frombuffer(b''.join(wkbs), dtype=np.uint8).copy()
+
+    # everything but the headers (byte order, type, number of rings and points) are coordinates
+    coordinates = np.ones(len(data), dtype=bool)
+    coordinates[(offsets[:, None] + np.arange(POLYGON_HEADER_SIZE)).ravel()] = False
+    coords = data[coordinates].view('<f8')
+
+    line = QgsGeometry()
+    line.fromWkb(struct.pack('<BII', WKB_LITTLE_ENDIAN, WKB_LINESTRING, len(coords) // 2) + coords.tobytes())
+    line.transform(transform)
+    wkb = bytes(line.asWkb())
+    order = '<' if wkb[0] == WKB_LITTLE_ENDIAN else '>'
+    data[coordinates] = np.frombuffer(wkb, dtype=order + 'f8', offset=9).astype('<f8').view(np.uint8)
+
+    buffer = data.tobytes()
+    return [buffer[start:start + size] for start, size in zip(offsets.tolist(), sizes.tolist())]
+
+
+_transform_cache = None
+
+
+def transform_cache():
+    """Returns the transform cache of the current project"""
+    global _transform_cache
+    if _transform_cache is None:
+        _transform_cache = TransformCache(QgsProject.instance())
+    return _transform_cache
+
+
+class IntersectionIndex:
+    """
+    Spatial index of the bounding boxes of the features of a layer, used to find the neighbours
+    a new shape must not overlap. The index is built in a background task, or on first use, and
+    then kept up to date with the edits of the layer; it is rebuilt after a commit or rollback as
+    feature ids may change.
+    """
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.index = None
+        self.boxes = {}
+        # background build: the task, the edits made since its snapshot and who waits for the index
+        self.task = None
+        self.changes = []
+        self.waiting = []
+
+        layer.featureAdded.connect(self.feature_added)
+        layer.featureDeleted.connect(self.feature_deleted)
+        layer.geometryChanged.connect(self.geometry_changed)
+        layer.afterCommitChanges.connect(self.invalidate)
+        layer.afterRollBack.connect(self.invalidate)
+        layer.crsChanged.connect(self.invalidate)
+
+    @property
+    def ready(self):
+        return self.index is not None
+
+    def build(self):
+        """Builds the index on the main thread, only for callers that can not wait for the task"""
+        self.cancel_task()
+        self.index = QgsSpatialIndex()
+        self.boxes = {}
+        request = QgsFeatureRequest().setNoAttributes()
+        for feature in self.layer.getFeatures(request):
+            if feature.hasGeometry():
+                self.insert(feature.id(), feature.geometry().boundingBox())
+        self.notify()
+
+    def build_in_background(self, callback=None):
+        """
+        Builds the index in a background task, unless it is ready or being built. The callback is called
+        on the main thread once the index is ready, right away if it already is.
+        """
+        if self.index is not None:
+            if callback is not None:
+                callback()
+            return
+        if callback is not None:
+            self.waiting.append(callback)
+        if self.task is None:
+            # imported here, the tasks module imports this module
+            from .geometry_shapes_tasks import start_index
+            self.changes = []
+            self.task = start_index(self.layer, self.built, self.build_failed)
+
+    def built(self, task, index, boxes):
+        if task is not self.task:
+            # a task of an outdated snapshot
+            return
+        self.task = None
+        self.index = index
+        self.boxes = boxes
+        # replay the edits that were made while the index was built
+        changes, self.changes = self.changes, []
+        for change in changes:
+            change()
+        self.notify()
+
+    def build_failed(self, task):
+        """
+        The task was canceled, e.g. from the task manager, or failed: build the index on the main thread
+        instead, those who wait for it must not wait forever
+        """
+        if task is not self.task:
+            return
+        self.task = None
+        QgsMessageLog.logMessage(tr(u"Indexing {} in the background was canceled or failed, it is indexed now").format(
+            self.layer.name()), 'GeometryShapes', Qgis.Warning)
+        self.build()
+
+    def notify(self):
+        waiting, self.waiting = self.waiting, []
+        for callback in waiting:
+            callback()
+
+    def cancel_task(self):
+        if self.task is not None:
+            try:
+                self.task.cancel()
+            except RuntimeError:
+                # the task has finished and is deleted
+                pass
+            self.task = None
+        self.changes = []
+
+    def invalidate(self):
+        self.index = None
+        self.boxes = {}
+        if self.task is not None:
+            # the snapshot is outdated, start over for those who wait
+            self.cancel_task()
+            self.build_in_background()
+
+    def building(self, change):
+        """Keeps an edit for after the index is built, returns False if the index is not being built"""
+        if self.task is None:
+            return False
+        self.changes.append(change)
+        return True
+
+    def insert(self, fid, box):
+        self.boxes[fid] = box
+        self.index.addFeature(fid, box)
+
+    def remove(self, fid):
+        box = self.boxes.pop(fid, None)
+        if box is not None:
+            feature = QgsFeature(fid)
+            feature.setGeometry(QgsGeometry.fromRect(box))
+            self.index.deleteFeature(feature)
+
+    def feature_added(self, fid):
+        if self.index is None:
+            self.building(lambda: self.feature_added(fid))
+            return
+        feature = self.layer.getFeature(fid)
+        if feature.hasGeometry():
+            self.insert(fid, feature.geometry().boundingBox())
+
+    def features_added(self, features):
+        """Adds features that were added through the provider, the layer does not signal those"""
+        if self.index is None:
+            self.building(lambda: self.features_added(features))
+            return
+        for feature in features:
+            if feature.hasGeometry():
+                self.insert(feature.id(), feature.geometry().boundingBox())
+
+    def feature_deleted(self, fid):
+        if self.index is None:
+            self.building(lambda: self.feature_deleted(fid))
+            return
+        self.remove(fid)
+
+    def geometry_changed(self, fid, geometry):
+        if self.index is None:
+            geometry = QgsGeometry(geometry)
+            self.building(lambda: self.geometry_changed(fid, geometry))
+            return
+        self.remove(fid)
+        if not geometry.isNull():
+            self.insert(fid, geometry.boundingBox())
+
+    def candidates(self, rect):
+        """
+        Returns the geometries of the features whose bounding box intersects the rectangle
+
+        :param rect: rectangle in layer CRS
+        :type rect: qgis.core.QgsRectangle
+        :rtype: list[qgis.core.QgsGeometry]
+        """
+        if self.index is None:
+            self.build()
+        fids = self.index.intersects(rect)
+        if not fids:
+            return []
+        request = QgsFeatureRequest().setFilterFids(fids).setNoAttributes()
+        return [feature.geometry() for feature in self.layer.getFeatures(request) if feature.hasGeometry()]
+
+
+class DefaultValueCache:
+    """
+    Keeps the prepared default value expressions of a layer and one expression context to evaluate
+    them in. The cache is cleared when fields are added or removed or the field configuration changes.
+    """
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.context = None
+        self.expressions = None
+
+        layer.attributeAdded.connect(self.invalidate)
+        layer.attributeDeleted.connect(self.invalidate)
+        layer.updatedFields.connect(self.invalidate)
+
+    def build(self):
+        self.context = self.layer.createExpressionContext()
+        self.expressions = []
+        for idx, field in enumerate(self.layer.fields()):
+            definition = field.defaultValueDefinition()
+            if definition.isValid() and definition.expression():
+                expression = QgsExpression(definition.expression())
+                expression.prepare(self.context)
+                self.expressions.append((idx, expression))
+
+    def invalidate(self):
+        self.context = None
+        self.expressions = None
+
+    def apply(self, feature):
+        """
+        Sets the default values of the layer on the feature
+
+        :type feature: qgis.core.QgsFeature
+        """
+        if self.expressions is None:
+            self.build()
+        self.context.setFeature(feature)
+        for idx, expression in self.expressions:
+            feature.setAttribute(idx, expression.evaluate(self.context))
+
+
+_layer_caches = {}
+
+
+def layer_cache(cache_class, layer):
+    """Returns the cache of the given class for a layer, the cache is shared and dropped with the layer"""
+    key = (cache_class, layer.id())
+    cache = _layer_caches.get(key)
+    if cache is None:
+        cache = cache_class(layer)
+        _layer_caches[key] = cache
+        layer.willBeDeleted.connect(lambda: _layer_caches.pop(key, None))
+    return cache
+
+
+def intersection_index(layer):
+    """Returns the (shared) intersection index of a layer"""
+    return layer_cache(IntersectionIndex, layer)
+
+
+def default_values(layer):
+    """Returns the (shared) default value cache of a layer"""
+    return layer_cache(DefaultValueCache, layer)
+
+
+def neighbours(geometry, layer, layers_to_check):
+    """
+    Returns the geometries of the features of the layers to check whose bounding box intersects the
+    geometry, in the CRS of the target layer. The features are read here, so this must run on the
+    main thread; the result is a snapshot that can be handed to a worker.
+
+    :param geometry: geometry in the CRS of the target layer
+    :type geometry: qgis.core.QgsGeometry
+    :param layer: target layer
+    :type layer: qgis.core.QgsVectorLayer
+    :param layers_to_check: layers with features the geometry must not overlap
+    :type layers_to_check: list[qgis.core.QgsVectorLayer]
+    :rtype: list[qgis.core.QgsGeometry]
+    """
+    if Qgis.versionInt() < 32200:
+        reverse = QgsCoordinateTransform.ReverseTransform
+    else:
+        reverse = Qgis.TransformDirection.Reverse
+
+    result = []
+    for check_layer in layers_to_check:
+        if not is_polygon_layer(check_layer):
+            continue
+
+        transform = None
+        rect = geometry.boundingBox()
+        if check_layer.crs() != layer.crs():
+            # the transform from the layer to check to the target layer
+            transform = transform_cache().transform(check_layer.crs(), layer)
+            rect = transform.transformBoundingBox(rect, reverse)
+
+        for candidate in intersection_index(check_layer).candidates(rect):
+            if transform is not None:
+                candidate.transform(transform)
+            result.append(candidate)
+    return result
+
+
+def clip(geometry, candidates, canceled=None):
+    """
+    Returns the geometry minus the area of the candidates that really intersect it, tested against
+    the prepared geometry. Only uses the geometries, so it can run in a worker thread.
+
+    :type geometry: qgis.core.QgsGeometry
+    :type candidates: list[qgis.core.QgsGeometry]
+    :param canceled: optional function that returns True when the result is no longer needed
+    :return: the clipped geometry, or None if canceled
+    :rtype: qgis.core.QgsGeometry
+    """
+    if not candidates:
+        return geometry
+
+    engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+    engine.prepareGeometry()
+    overlapping = []
+    for candidate in candidates:
+        if canceled is not None and canceled():
+            return None
+        if engine.intersects(candidate.constGet()):
+            overlapping.append(candidate)
+
+    if not overlapping:
+        return geometry
+    return geometry.difference(QgsGeometry.unaryUnion(overlapping))
+
+
+def avoid_intersections(geometry, layer, layers_to_check):
+    """
+    Returns the geometry minus the area of all overlapping features of the layers to check. Candidates
+    are found through the bounding box index of each layer and tested against the prepared geometry,
+    only the features that really intersect are subtracted.
+
+    :param geometry: geometry in the CRS of the target layer
+    :type geometry: qgis.core.QgsGeometry
+    :param layer: target layer
+    :type layer: qgis.core.QgsVectorLayer
+    :param layers_to_check: layers with features the geometry must not overlap
+    :type layers_to_check: list[qgis.core.QgsVectorLayer]
+    :rtype: qgis.core.QgsGeometry
+    """
+    return clip(geometry, neighbours(geometry, layer, layers_to_check))
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from qgis.PyQt.QtCore import Qt, QPointF, QRectF, QSettings
+from qgis.PyQt.QtGui import QBrush, QColor, QPainter, QPainterPath, QPen, QPolygonF, QTransform
+from qgis.core import QgsPointXY
+from qgis.gui import QgsMapCanvasItem
+
+from .geometry_shapes_kernel import OVAL, RECTANGLE, oval_coords, segments_for_tolerance
+
+
+class PreviewStyle:
+    """
+    Snapshot of the digitizing style of the QGIS options, read once and reloaded when the options change.
+    The version is increased on every load, so items only restyle when the style has changed.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.lineWidth = 1
+        self.lineColor = QColor(255, 0, 0, 199)
+        self.fillColor = QColor(255, 0, 0, 31)
+
+    def load(self):
+        settings = QSettings()
+        settings.beginGroup('qgis/digitizing')
+        self.lineWidth = settings.value('line_width', 1, type=int)
+        self.fillColor = QColor(settings.value('fill_color_red', 255, type=int),
+                                settings.value('fill_color_green', 0, type=int),
+                                settings.value('fill_color_blue', 0, type=int),
+                                settings.value('fill_color_alpha', 31, type=int))
+        self.lineColor = QColor(settings.value('line_color_red', 255, type=int),
+                                settings.value('line_color_green', 0, type=int),
+                                settings.value('line_color_blue', 0, type=int),
+                                settings.value('line_color_alpha', 199, type=int))
+        self.version += 1
+
+
+_preview_style = None
+
+
+def preview_style():
+    """Returns the digitizing style for the previews, it is read from the settings on first use"""
+    global _preview_style
+    if _preview_style is None:
+        _preview_style = PreviewStyle()
+        _preview_style.load()
+    return _preview_style
+
+
+class ShapePreviewItem(QgsMapCanvasItem):
+    """
+    Preview of a shape and its helper lines on the map canvas.
+
+    The shape is kept as a path in screen pixels, relative to the start point. The item itself
+    is positioned at the start point, so panning only moves the item and the path is only rebuilt
+    when the shape itself changes. No map geometry is created for the preview. The item is meant
+    to be kept while its tool is active: clear() hides it until the next shape is set.
+
+    The rotation of the shape is the rotation of the item around the center of the shape, so
+    rotating the preview does not rebuild the path. The canvas rotation is the item transform.
+    """
+    Rectangle = RECTANGLE
+    Oval = OVAL
+
+    def __init__(self, canvas, shape):
+        super(ShapePreviewItem, self).__init__(canvas)
+        self.canvas = canvas
+        self.shape = shape
+        # maximum deviation of the preview from the true oval, in pixels
+        self.tolerance = 0.5
+        self.startPoint = None
+        self.endPoint = None
+        self.unitsPerPixel = None
+        self.canvasRotation = None
+        self.styleVersion = None
+        self.filled = True
+
+        self.path = QPainterPath()
+        self.helperPath = QPainterPath()
+        self.bounds = QRectF()
+
+        self.pen = QPen(QColor(255, 0, 0, 199))
+        self.pen.setCosmetic(True)
+        self.brush = QBrush(QColor(255, 0, 0, 31))
+        self.helperPen = QPen(QColor(Qt.GlobalColor.gray))
+        self.helperPen.setCosmetic(True)
+
+    def set_style(self, line_color, fill_color, line_width):
+        self.pen.setColor(line_color)
+        self.pen.setWidth(line_width)
+        self.brush.setColor(fill_color)
+        self.helperPen.setWidth(line_width)
+        self.update()
+
+    def apply_style(self, style):
+        """
+        Takes the style of a snapshot, unless it has not changed since it was last applied
+
+        :type style: PreviewStyle
+        """
+        if style.version != self.styleVersion:
+            self.styleVersion = style.version
+            self.set_style(style.lineColor, style.fillColor, style.lineWidth)
+
+    def set_filled(self, filled):
+        """Fills the shape, or only draws its outline, e.g. while a clipped shape is shown on top"""
+        if filled != self.filled:
+            self.filled = filled
+            self.update()
+
+    def clear(self):
+        """Hides the item and forgets the shape, so it can be reused for the next one"""
+        self.hide()
+        self.startPoint = None
+        self.endPoint = None
+
+    def set_points(self, start_point, end_point):
+        """
+        Sets the defining points of the shape in map coordinates and rebuilds the preview
+
+        :type start_point: qgis.core.QgsPointXY
+        :type end_point: qgis.core.QgsPointXY
+        """
+        if start_point == self.startPoint and end_point == self.endPoint:
+            return
+
+        self.endPoint = QgsPointXY(end_point)
+        if start_point != self.startPoint:
+            self.startPoint = QgsPointXY(start_point)
+            self.updatePosition()
+        self.build_path()
+
+    def set_rotation(self, rotation):
+        """
+        Rotates the preview around the center of the shape
+
+        :param rotation: clockwise rotation in degrees
+        :type rotation: float
+        """
+        if rotation != self.rotation():
+            self.setRotation(rotation)
+
+    def updatePosition(self):
+        """Called by the canvas when the extent changes: the start point moves on screen"""
+        if self.startPoint is None:
+            return
+        self.setPos(self.toCanvasCoordinates(self.startPoint))
+        if self.canvas.rotation() != self.canvasRotation:
+            self.canvasRotation = self.canvas.rotation()
+            self.setTransform(QTransform().rotate(self.canvasRotation))
+        # the path is in pixels, so only a change of scale requires a rebuild
+        if self.canvas.mapUnitsPerPixel() != self.unitsPerPixel:
+            self.build_path()
+
+    def build_path(self):
+        """Rebuilds the shape and helper paths in pixels relative to the start point"""
+        if self.startPoint is None or self.endPoint is None:
+            return
+
+        self.unitsPerPixel = self.canvas.mapUnitsPerPixel()
+        dx = (self.endPoint.x() - self.startPoint.x()) / self.unitsPerPixel
+        dy = (self.startPoint.y() - self.endPoint.y()) / self.unitsPerPixel
+
+        path = QPainterPath()
+        helper_path = QPainterPath()
+        if self.shape == self.Oval:
+            segments = segments_for_tolerance(max(abs(dx), abs(dy)), self.tolerance)
+            coords = oval_coords(0, 0, abs(dx), abs(dy), segments)
+            path.addPolygon(QPolygonF([QPointF(x, y) for x, y in coords.tolist()]))
+            helper_path.addRect(QRectF(-abs(dx), -abs(dy), 2 * abs(dx), 2 * abs(dy)))
+            self.setTransformOriginPoint(0, 0)
+        else:
+            path.addRect(QRectF(0, 0, dx, dy).normalized())
+            self.setTransformOriginPoint(dx / 2, dy / 2)
+        helper_path.moveTo(0, 0)
+        helper_path.lineTo(dx, dy)
+
+        self.prepareGeometryChange()
+        self.path = path
+        self.helperPath = helper_path
+        margin = max(self.pen.widthF(), self.helperPen.widthF(), 1)
+        self.bounds = path.boundingRect().united(helper_path.boundingRect()).adjusted(-margin, -margin, margin, margin)
+        self.update()
+
+    def boundingRect(self):
+        return self.bounds
+
+    def paint(self, painter, option=None, widget=None):
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(self.helperPen)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawPath(self.helperPath)
+        painter.setPen(self.pen)
+        painter.setBrush(self.brush if self.filled else Qt.BrushStyle.NoBrush)
+        painter.drawPath(self.path)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Shape types and limits shared by the kernel and the modules that are loaded with QGIS.
+ No imports, so using these does not load NumPy at startup.
+"""
+RECTANGLE = 0
+OVAL = 1
+
+MIN_SEGMENTS = 4
+MAX_SEGMENTS = 5000
@@ -21,13 +21,10 @@
  ***************************************************************************/
 """
 
-import os
-from qgis.PyQt import uic
 from qgis.PyQt.QtWidgets import QDialog
 
-
-FORM_CLASS, _ = uic.loadUiType(os.path.join(
-    os.path.dirname(__file__), 'geometry_shapes_dialog_base.ui'))
+# the form is compiled from geometry_shapes_dialog_base.ui, so no XML is parsed at runtime
+from .geometry_shapes_dialog_base import Ui_GeometryShapesDialogBase as FORM_CLASS
 
 
 class GeometryShapesDialog(QDialog, FORM_CLASS):
@@ -40,3 +37,14 @@ class GeometryShapesDialog(QDialog, FORM_CLASS):
         # http://qt-project.org/doc/qt-4.8/designer-using-a-ui-file.html
         # #widgets-and-dialogs-with-auto-connect
         self.setupUi(self)
+
+
+_dialog = None
+
+
+def shared_dialog():
+    """Returns the dialog that is shared by all map tools, it is created on first use"""
+    global _dialog
+    if _dialog is None:
+        _dialog = GeometryShapesDialog()
+    return _dialog
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+ Compiled form of geometry_shapes_dialog_base.ui, so the .ui XML does not have to be parsed
+ when the plugin is loaded. Keep it in sync with the .ui file: regenerate it with
+     pyuic5 -o geometry_shapes_dialog_base.py geometry_shapes_dialog_base.ui
+ and import QtCore and QtWidgets from qgis.PyQt instead of PyQt5, with scoped enums.
+"""
+from qgis.PyQt import QtCore, QtWidgets
+
+
+class Ui_GeometryShapesDialogBase(object):
+    def setupUi(self, GeometryShapesDialogBase):
+        GeometryShapesDialogBase.setObjectName("GeometryShapesDialogBase")
+        GeometryShapesDialogBase.resize(264, 236)
+        self.verticalLayout_2 = QtWidgets.QVBoxLayout(GeometryShapesDialogBase)
+        self.verticalLayout_2.setObjectName("verticalLayout_2")
+        self.formLayout = QtWidgets.QFormLayout()
+        self.formLayout.setObjectName("formLayout")
+        self.label = QtWidgets.QLabel(GeometryShapesDialogBase)
+        self.label.setObjectName("label")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.ItemRole.LabelRole, self.label)
+        self.label_2 = QtWidgets.QLabel(GeometryShapesDialogBase)
+        self.label_2.setObjectName("label_2")
+        self.formLayout.setWidget(1, QtWidgets.QFormLayout.ItemRole.LabelRole, self.label_2)
+        self.label_rotation = QtWidgets.QLabel(GeometryShapesDialogBase)
+        self.label_rotation.setObjectName("label_rotation")
+        self.formLayout.setWidget(2, QtWidgets.QFormLayout.ItemRole.LabelRole, self.label_rotation)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Fixed)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        self.rotation = QtWidgets.QSpinBox(GeometryShapesDialogBase)
+        sizePolicy.setHeightForWidth(self.rotation.sizePolicy().hasHeightForWidth())
+        self.rotation.setSizePolicy(sizePolicy)
+        self.rotation.setWrapping(True)
+        self.rotation.setMinimum(-359)
+        self.rotation.setMaximum(359)
+        self.rotation.setObjectName("rotation")
+        self.formLayout.setWidget(2, QtWidgets.QFormLayout.ItemRole.FieldRole, self.rotation)
+        self.width = QtWidgets.QDoubleSpinBox(GeometryShapesDialogBase)
+        sizePolicy.setHeightForWidth(self.width.sizePolicy().hasHeightForWidth())
+        self.width.setSizePolicy(sizePolicy)
+        self.width.setDecimals(5)
+        self.width.setMaximum(1000000.0)
+        self.width.setObjectName("width")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.ItemRole.FieldRole, self.width)
+        self.height = QtWidgets.QDoubleSpinBox(GeometryShapesDialogBase)
+        sizePolicy.setHeightForWidth(self.height.sizePolicy().hasHeightForWidth())
+        self.height.setSizePolicy(sizePolicy)
+        self.height.setDecimals(5)
+        self.height.setMaximum(1000000.0)
+        self.height.setObjectName("height")
+        self.formLayout.setWidget(1, QtWidgets.QFormLayout.ItemRole.FieldRole, self.height)
+        self.label_segments = QtWidgets.QLabel(GeometryShapesDialogBase)
+        self.label_segments.setObjectName("label_segments")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.ItemRole.LabelRole, self.label_segments)
+        self.segments = QtWidgets.QSpinBox(GeometryShapesDialogBase)
+        self.segments.setEnabled(True)
+        sizePolicy.setHeightForWidth(self.segments.sizePolicy().hasHeightForWidth())
+        self.segments.setSizePolicy(sizePolicy)
+        self.segments.setSuffix("")
+        self.segments.setMinimum(4)
+        self.segments.setMaximum(360)
+        self.segments.setProperty("value", 50)
+        self.segments.setObjectName("segments")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.ItemRole.FieldRole, self.segments)
+        self.adaptive = QtWidgets.QCheckBox(GeometryShapesDialogBase)
+        self.adaptive.setObjectName("adaptive")
+        self.formLayout.setWidget(4, QtWidgets.QFormLayout.ItemRole.LabelRole, self.adaptive)
+        self.tolerance = QtWidgets.QDoubleSpinBox(GeometryShapesDialogBase)
+        self.tolerance.setEnabled(False)
+        sizePolicy.setHeightForWidth(self.tolerance.sizePolicy().hasHeightForWidth())
+        self.tolerance.setSizePolicy(sizePolicy)
+        self.tolerance.setDecimals(5)
+        self.tolerance.setMinimum(1e-05)
+        self.tolerance.setMaximum(1000000.0)
+        self.tolerance.setProperty("value", 0.01)
+        self.tolerance.setObjectName("tolerance")
+        self.formLayout.setWidget(4, QtWidgets.QFormLayout.ItemRole.FieldRole, self.tolerance)
+        self.curved = QtWidgets.QCheckBox(GeometryShapesDialogBase)
+        self.curved.setObjectName("curved")
+        self.formLayout.setWidget(5, QtWidgets.QFormLayout.ItemRole.SpanningRole, self.curved)
+        self.verticalLayout_2.addLayout(self.formLayout)
+        self.grid = QtWidgets.QGroupBox(GeometryShapesDialogBase)
+        self.grid.setObjectName("grid")
+        self.formLayout_grid = QtWidgets.QFormLayout(self.grid)
+        self.formLayout_grid.setObjectName("formLayout_grid")
+        self.label_columns = QtWidgets.QLabel(self.grid)
+        self.label_columns.setObjectName("label_columns")
+        self.formLayout_grid.setWidget(0, QtWidgets.QFormLayout.ItemRole.LabelRole, self.label_columns)
+        self.columns = QtWidgets.QSpinBox(self.grid)
+        self.columns.setMinimum(1)
+        self.columns.setMaximum(100000)
+        self.columns.setProperty("value", 1)
+        self.columns.setObjectName("columns")
+        self.formLayout_grid.setWidget(0, QtWidgets.QFormLayout.ItemRole.FieldRole, self.columns)
+        self.label_rows = QtWidgets.QLabel(self.grid)
+        self.label_rows.setObjectName("label_rows")
+        self.formLayout_grid.setWidget(1, QtWidgets.QFormLayout.ItemRole.LabelRole, self.label_rows)
+        self.rows = QtWidgets.QSpinBox(self.grid)
+        self.rows.setMinimum(1)
+        self.rows.setMaximum(100000)
+        self.rows.setProperty("value", 1)
+        self.rows.setObjectName("rows")
+        self.formLayout_grid.setWidget(1, QtWidgets.QFormLayout.ItemRole.FieldRole, self.rows)
+        self.label_spacing_x = QtWidgets.QLabel(self.grid)
+        self.label_spacing_x.setObjectName("label_spacing_x")
+        self.formLayout_grid.setWidget(2, QtWidgets.QFormLayout.ItemRole.LabelRole, self.label_spacing_x)
+        self.spacing_x = QtWidgets.QDoubleSpinBox(self.grid)
+        self.spacing_x.setDecimals(5)
+        self.spacing_x.setMinimum(0.0)
+        self.spacing_x.setMaximum(1000000.0)
+        self.spacing_x.setObjectName("spacing_x")
+        self.formLayout_grid.setWidget(2, QtWidgets.QFormLayout.ItemRole.FieldRole, self.spacing_x)
+        self.label_spacing_y = QtWidgets.QLabel(self.grid)
+        self.label_spacing_y.setObjectName("label_spacing_y")
+        self.formLayout_grid.setWidget(3, QtWidgets.QFormLayout.ItemRole.LabelRole, self.label_spacing_y)
+        self.spacing_y = QtWidgets.QDoubleSpinBox(self.grid)
+        self.spacing_y.setDecimals(5)
+        self.spacing_y.setMinimum(0.0)
+        self.spacing_y.setMaximum(1000000.0)
+        self.spacing_y.setObjectName("spacing_y")
+        self.formLayout_grid.setWidget(3, QtWidgets.QFormLayout.ItemRole.FieldRole, self.spacing_y)
+        self.verticalLayout_2.addWidget(self.grid)
+        self.button_box = QtWidgets.QDialogButtonBox(GeometryShapesDialogBase)
+        self.button_box.setOrientation(QtCore.Qt.Orientation.Horizontal)
+        self.button_box.setStandardButtons(QtWidgets.QDialogButtonBox.StandardButton.Cancel | QtWidgets.QDialogButtonBox.StandardButton.Ok)
+        self.button_box.setObjectName("button_box")
+        self.verticalLayout_2.addWidget(self.button_box)
+
+        self.retranslateUi(GeometryShapesDialogBase)
+        self.button_box.accepted.connect(GeometryShapesDialogBase.accept)
+        self.adaptive.toggled['bool'].connect(self.tolerance.setEnabled)
+        self.adaptive.toggled['bool'].connect(self.segments.setDisabled)
+        self.button_box.rejected.connect(GeometryShapesDialogBase.reject)
+        QtCore.QMetaObject.connectSlotsByName(GeometryShapesDialogBase)
+
+    def retranslateUi(self, GeometryShapesDialogBase):
+        _translate = QtCore.QCoreApplication.translate
+        GeometryShapesDialogBase.setWindowTitle(_translate("GeometryShapesDialogBase", "Set size"))
+        self.label.setText(_translate("GeometryShapesDialogBase", "Width (x)"))
+        self.label_2.setText(_translate("GeometryShapesDialogBase", "Height (y)"))
+        self.label_rotation.setText(_translate("GeometryShapesDialogBase", "Rotation"))
+        self.rotation.setSuffix(_translate("GeometryShapesDialogBase", "°"))
+        self.label_segments.setText(_translate("GeometryShapesDialogBase", "Segments"))
+        self.adaptive.setToolTip(_translate("GeometryShapesDialogBase", "Choose the number of segments from the maximum deviation between the oval and its segments, in layer units"))
+        self.adaptive.setText(_translate("GeometryShapesDialogBase", "Max. deviation"))
+        self.curved.setToolTip(_translate("GeometryShapesDialogBase", "Write ovals and circles as circular arcs instead of segments, if the layer supports curved geometries"))
+        self.curved.setText(_translate("GeometryShapesDialogBase", "Curved geometry"))
+        self.grid.setTitle(_translate("GeometryShapesDialogBase", "Grid"))
+        self.label_columns.setText(_translate("GeometryShapesDialogBase", "Columns"))
+        self.label_rows.setText(_translate("GeometryShapesDialogBase", "Rows"))
+        self.label_spacing_x.setText(_translate("GeometryShapesDialogBase", "Spacing (x)"))
+        self.label_spacing_y.setText(_translate("GeometryShapesDialogBase", "Spacing (y)"))
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Vertex kernel for the basic shapes. Plain NumPy, no QGIS imports, so it can
+ be used by the map tools as well as by batch and headless code.
+"""
+import math
+import struct
+from functools import lru_cache
+
+import numpy as np
+
+from .geometry_shapes_constants import MAX_SEGMENTS, MIN_SEGMENTS, OVAL, RECTANGLE  # noqa: F401
+
+WKB_LITTLE_ENDIAN = 1
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+WKB_CIRCULAR_STRING = 8
+WKB_CURVE_POLYGON = 10
+# byte order, type, number of rings and number of points of a single ring polygon
+POLYGON_HEADER_SIZE = 13
+
+# number of circular arcs used to approximate an oval that is not a circle
+OVAL_ARCS = 16
+
+# compact record of a shape for the bulk paths, about 50 bytes per shape instead of a tuple of Python
+# objects; width and height are the radii of ovals, rotation is clockwise in degrees, segments are for ovals
+SPEC_DTYPE = np.dtype([('id', '<i8'), ('shape', 'u1'), ('x', '<f8'), ('y', '<f8'), ('width', '<f8'),
+                       ('height', '<f8'), ('rotation', '<f8'), ('segments', '<i4')])
+
+# square of size 2 around (0, 0), in the same vertex order as QgsGeometry.fromRect
+UNIT_SQUARE = np.array(((-1.0, -1.0), (-1.0, 1.0), (1.0, 1.0), (1.0, -1.0), (-1.0, -1.0)))
+UNIT_SQUARE.flags.writeable = False
+
+
+@lru_cache(maxsize=32)
+def unit_circle(segments):
+    """
+    Returns the closed ring of a circle with radius 1 around (0, 0) as a read-only
+    (segments + 1, 2) array of cos/sin values. Tables are cached per segment count.
+
+    :param segments: number of segments of the ring
+    :type segments: int
+    :rtype: numpy.ndarray
+    """
+    angles = np.arange(segments + 1) * (2 * np.pi / segments)
+    table = np.empty((segments + 1, 2))
+    np.cos(angles, out=table[:, 0])
+    np.sin(angles, out=table[:, 1])
+    # close the ring exactly, the last angle equals 2 * pi
+    table[-1] = table[0]
+    table.flags.writeable = False
+    return table
+
+
+def segments_for_tolerance(radius, tolerance, minimum=MIN_SEGMENTS, maximum=MAX_SEGMENTS):
+    """
+    Returns the number of segments for a circle so that the distance between each arc and its
+    chord (the sagitta, r * (1 - cos(pi / n))) stays within the tolerance. For ovals pass the
+    largest radius. Radius and tolerance must be in the same units, e.g. pixels or layer units.
+
+    :type radius: float
+    :type tolerance: float
+    :rtype: int
+    """
+    if tolerance <= 0:
+        return maximum
+    if radius <= tolerance:
+        return minimum
+    segments = math.ceil(math.pi / math.acos(1 - tolerance / radius))
+    return max(minimum, min(maximum, segments))
+
+
+def affine_matrix(sx, sy, rotation=0.0):
+    """
+    Returns the 2x2 matrix that scales a unit ring and rotates it clockwise, for row vectors (ring @ matrix)
+
+    :param sx: scale factor along the x axis
+    :param sy: scale factor along the y axis
+    :param rotation: clockwise rotation in degrees, like QgsGeometry.rotate
+    :rtype: numpy.ndarray
+    """
+    angle = -math.radians(rotation)
+    cos = math.cos(angle)
+    sin = math.sin(angle)
+    return np.array(((sx * cos, sx * sin), (-sy * sin, sy * cos)))
+
+
+def transform_ring(table, cx, cy, sx, sy, rotation=0.0, out=None):
+    """
+    Scales, rotates and translates a unit ring in one affine step
+
+    :param table: (n, 2) unit ring, e.g. from unit_circle or UNIT_SQUARE
+    :param cx: x of the center
+    :param cy: y of the center
+    :param sx: scale factor along the x axis
+    :param sy: scale factor along the y axis
+    :param rotation: clockwise rotation in degrees around the center
+    :param out: optional array to write the coordinates into
+    :return: (n, 2) array of x/y coordinates
+    :rtype: numpy.ndarray
+    """
+    if out is None:
+        out = np.empty_like(table)
+    if rotation:
+        np.matmul(table, affine_matrix(sx, sy, rotation), out=out)
+    else:
+        # a plain scale does not need the matrix product
+        np.multiply(table, (sx, sy), out=out)
+    out += (cx, cy)
+    return out
+
+
+def oval_coords(cx, cy, rx, ry, segments, rotation=0.0, out=None):
+    """
+    Returns the closed ring of an oval as a (segments + 1, 2) array of x/y coordinates
+
+    :param cx: x of the center
+    :param cy: y of the center
+    :param rx: radius along the x axis
+    :param ry: radius along the y axis
+    :param segments: number of segments of the ring
+    :param rotation: clockwise rotation in degrees around the center
+    :param out: optional array to write the coordinates into
+    :rtype: numpy.ndarray
+    """
+    return transform_ring(unit_circle(segments), cx, cy, rx, ry, rotation, out)
+
+
+def oval_arc_coords(cx, cy, rx, ry, rotation=0.0):
+    """
+    Returns the control points of a closed circular string for an oval as a (2 * arcs + 1, 2) array.
+    Each arc runs through three points on the oval: a circle is exact with two arcs, other ovals
+    are approximated with OVAL_ARCS arcs.
+
+    :rtype: numpy.ndarray
+    """
+    arcs = 2 if rx == ry else OVAL_ARCS
+    return oval_coords(cx, cy, rx, ry, 2 * arcs, rotation)
+
+
+def transform_rings(table, cx, cy, sx, sy, rotation=None):
+    """
+    Scales, rotates and translates a unit ring for many shapes in one affine step
+
+    :param table: (n, 2) unit ring, e.g. from unit_circle or UNIT_SQUARE
+    :param cx: array of center x values
+    :param cy: array of center y values
+    :param sx: array of scale factors along the x axis
+    :param sy: array of scale factors along the y axis
+    :param rotation: optional array of clockwise rotations in degrees
+    :return: (count, n, 2) array of x/y coordinates
+    :rtype: numpy.ndarray
+    """
+    sx = np.asarray(sx, dtype=float)
+    sy = np.asarray(sy, dtype=float)
+    matrices = np.zeros((len(cx), 2, 2))
+    if rotation is None:
+        matrices[:, 0, 0] = sx
+        matrices[:, 1, 1] = sy
+    else:
+        # clockwise, like QgsGeometry.rotate
+        angle = -np.radians(rotation)
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+        matrices[:, 0, 0] = sx * cos
+        matrices[:, 0, 1] = sx * sin
+        matrices[:, 1, 0] = -sy * sin
+        matrices[:, 1, 1] = sy * cos
+    out = np.matmul(table, matrices)
+    out += np.column_stack((cx, cy))[:, None, :]
+    return out
+
+
+def ovals_coords(cx, cy, rx, ry, segments, rotation=None):
+    """
+    Returns the closed rings of many ovals at once as a (count, segments + 1, 2) array
+
+    :param cx: array of center x values
+    :param cy: array of center y values
+    :param rx: array of radii along the x axis
+    :param ry: array of radii along the y axis
+    :param segments: number of segments of each ring
+    :param rotation: optional array of clockwise rotations in degrees
+    :rtype: numpy.ndarray
+    """
+    return transform_rings(unit_circle(segments), cx, cy, rx, ry, rotation)
+
+
+def grid_centers(cx, cy, pitch_x, pitch_y, rows, columns, start=0, end=None):
+    """
+    Returns the centers of a grid of cells, row by row, starting at the center of the first cell.
+    With start and end only the centers of that range of cells are built, so a large grid can be
+    produced chunk by chunk.
+
+    :param cx: x of the center of the first cell
+    :param cy: y of the center of the first cell
+    :param pitch_x: distance between the centers of two columns, negative to grow to the left
+    :param pitch_y: distance between the centers of two rows, negative to grow downwards
+    :type rows: int
+    :type columns: int
+    :param start: index of the first cell, row by row
+    :param end: index after the last cell, all cells by default
+    :return: arrays of x and y values
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    if end is None:
+        end = rows * columns
+    row, column = np.divmod(np.arange(start, end, dtype=np.int64), columns)
+    return cx + column * pitch_x, cy + row * pitch_y
+
+
+def rectangle_coords(x_min, y_min, x_max, y_max, rotation=0.0, out=None):
+    """
+    Returns the closed ring of a rectangle as a (5, 2) array of x/y coordinates,
+    in the same vertex order as QgsGeometry.fromRect
+
+    :param rotation: clockwise rotation in degrees around the center of the rectangle
+    :rtype: numpy.ndarray
+    """
+    if rotation:
+        return transform_ring(UNIT_SQUARE, (x_min + x_max) / 2, (y_min + y_max) / 2,
+                              (x_max - x_min) / 2, (y_max - y_min) / 2, rotation, out)
+    if out is None:
+        out = np.empty((5, 2))
+    out[:] = ((x_min, y_min), (x_min, y_max), (x_max, y_max), (x_max, y_min), (x_min, y_min))
+    return out
+
+
+def rectangles_coords(cx, cy, width, height, rotation=None):
+    """
+    Returns the closed rings of many rectangles around their centers at once as a (count, 5, 2) array
+
+    :param cx: array of center x values
+    :param cy: array of center y values
+    :param width: array of widths
+    :param height: array of heights
+    :param rotation: optional array of clockwise rotations in degrees
+    :rtype: numpy.ndarray
+    """
+    return transform_rings(UNIT_SQUARE, cx, cy, np.multiply(width, 0.5), np.multiply(height, 0.5), rotation)
+
+
+def polygon_wkb(ring):
+    """
+    Packs a closed ring into the WKB of a single ring polygon
+
+    :param ring: (n, 2) array of x/y coordinates
+    :rtype: bytes
+    """
+    ring = np.ascontiguousarray(ring, dtype='<f8')
+    return struct.pack('<BIII', WKB_LITTLE_ENDIAN, WKB_POLYGON, 1, len(ring)) + ring.tobytes()
+
+
+def curve_polygon_wkb(ring):
+    """
+    Packs the control points of a closed circular string into the WKB of a single ring curve polygon
+
+    :param ring: (2 * arcs + 1, 2) array of x/y coordinates
+    :rtype: bytes
+    """
+    ring = np.ascontiguousarray(ring, dtype='<f8')
+    return struct.pack('<BIIBII', WKB_LITTLE_ENDIAN, WKB_CURVE_POLYGON, 1,
+                       WKB_LITTLE_ENDIAN, WKB_CIRCULAR_STRING, len(ring)) + ring.tobytes()
+
+
+def polygons_wkb(rings):
+    """
+    Packs many closed rings of equal length into a list of single ring polygon WKB.
+    All records are written into one contiguous buffer first and then sliced per shape.
+
+    :param rings: (count, n, 2) array of x/y coordinates
+    :rtype: list[bytes]
+    """
+    count, points = rings.shape[:2]
+    record = np.dtype([('order', 'u1'), ('type', '<u4'), ('rings', '<u4'), ('points', '<u4'),
+                       ('coords', '<f8', (points, 2))])
+    records = np.empty(count, dtype=record)
+    records['order'] = WKB_LITTLE_ENDIAN
+    records['type'] = WKB_POLYGON
+    records['rings'] = 1
+    records['points'] = points
+    records['coords'] = rings
+    buffer = records.tobytes()
+    size = record.itemsize
+    return [buffer[i:i + size] for i in range(0, len(buffer), size)]
+
+
+def shapes_wkb(shape, cx, cy, width, height, rotation=None, segments=None):
+    """
+    Returns the polygon WKB of many rectangles or ovals around their centers, in input order.
+    Ovals with different segment counts are built per group of equal segment count.
+
+    :param shape: RECTANGLE or OVAL
+    :param cx: array of center x values
+    :param cy: array of center y values
+    :param width: array of widths (rectangles) or radii along the x axis (ovals)
+    :param height: array of heights (rectangles) or radii along the y axis (ovals)
+    :param rotation: optional array of clockwise rotations in degrees
+    :param segments: number of segments of ovals, a single value or an array
+    :rtype: list[bytes]
+    """
+    if shape == RECTANGLE:
+        return polygons_wkb(rectangles_coords(cx, cy, width, height, rotation))
+
+    segments = np.broadcast_to(np.asarray(segments, dtype=int), np.shape(cx))
+    groups = np.unique(segments)
+    if len(groups) == 1:
+        return polygons_wkb(ovals_coords(cx, cy, width, height, int(groups[0]), rotation))
+
+    cx, cy, width, height = (np.asarray(a) for a in (cx, cy, width, height))
+    rotation = None if rotation is None else np.asarray(rotation)
+    wkbs = [None] * len(cx)
+    for group in groups:
+        idx = np.flatnonzero(segments == group)
+        rings = ovals_coords(cx[idx], cy[idx], width[idx], height[idx], int(group),
+                             None if rotation is None else rotation[idx])
+        for i, wkb in zip(idx.tolist(), polygons_wkb(rings)):
+            wkbs[i] = wkb
+    return wkbs
+
+
+def specs_wkb(shapes, cx, cy, width, height, rotation=None, segments=None):
+    """
+    Returns the polygon WKB of a mix of rectangles and ovals in input order, each shape type is
+    built in bulk. Only takes and returns plain arrays and bytes, so it can run in a worker process.
+
+    :param shapes: array of RECTANGLE or OVAL values
+    :param cx: array of center x values
+    :param cy: array of center y values
+    :param width: array of widths (rectangles) or radii along the x axis (ovals)
+    :param height: array of heights (rectangles) or radii along the y axis (ovals)
+    :param rotation: optional array of clockwise rotations in degrees
+    :param segments: array of segment counts of ovals
+    :rtype: list[bytes]
+    """
+    shapes = np.asarray(shapes)
+    groups = np.unique(shapes)
+    if len(groups) == 1:
+        return shapes_wkb(int(groups[0]), cx, cy, width, height, rotation, segments)
+
+    wkbs = [None] * len(shapes)
+    for shape in groups:
+        idx = np.flatnonzero(shapes == shape)
+        for i, wkb in zip(idx.tolist(), shapes_wkb(int(shape), cx[idx], cy[idx], width[idx], height[idx],
+                                                   None if rotation is None else rotation[idx],
+                                                   None if segments is None else segments[idx])):
+            wkbs[i] = wkb
+    return wkbs
+
+
+def spec_array(count):
+    """
+    Returns a zeroed array of shape records, see SPEC_DTYPE
+
+    :type count: int
+    :rtype: numpy.ndarray
+    """
+    return np.zeros(count, dtype=SPEC_DTYPE)
+
+
+def spec_array_wkb(specs):
+    """
+    Returns the polygon WKB of an array of shape records in input order. The records are only turned
+    into geometry here, and an array of records is cheap to send to a worker process.
+
+    :param specs: array with dtype SPEC_DTYPE
+    :rtype: list[bytes]
+    """
+    rotation = specs['rotation'] if specs['rotation'].any() else None
+    segments = np.clip(specs['segments'], MIN_SEGMENTS, MAX_SEGMENTS)
+    return specs_wkb(specs['shape'], specs['x'], specs['y'], specs['width'], specs['height'], rotation, segments)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import os
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import Qgis, QgsFeature, QgsFeatureSink, QgsGeometry, QgsProcessing, \
+    QgsProcessingAlgorithm, QgsProcessingException, QgsProcessingParameterEnum, QgsProcessingParameterFeatureSink, \
+    QgsProcessingParameterFeatureSource, QgsProcessingParameterNumber, QgsProcessingParameters, \
+    QgsProcessingProvider, QgsPropertyDefinition, QgsWkbTypes
+
+from .geometry_shapes_constants import MAX_SEGMENTS, MIN_SEGMENTS, OVAL, RECTANGLE
+
+# number of features that are generated and written at once
+CHUNK_SIZE = 10000
+
+if Qgis.versionInt() < 33600:
+    SourceType = QgsProcessing.SourceType
+    NumberType = QgsProcessingParameterNumber.Type
+    VectorPoint = SourceType.TypeVectorPoint
+    VectorPolygon = SourceType.TypeVectorPolygon
+else:
+    SourceType = Qgis.ProcessingSourceType
+    NumberType = Qgis.ProcessingNumberParameterType
+    VectorPoint = SourceType.VectorPoint
+    VectorPolygon = SourceType.VectorPolygon
+
+WkbType = QgsWkbTypes.Type if Qgis.versionInt() < 33000 else Qgis.WkbType
+
+
+class GeometryShapesProvider(QgsProcessingProvider):
+    def id(self):
+        return 'geometryshapes'
+
+    def name(self):
+        return 'Geometry Shapes'
+
+    def icon(self):
+        return QIcon(os.path.join(os.path.dirname(__file__), 'geometry_shapes.png'))
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(GenerateShapesAlgorithm())
+
+
+class GenerateShapesAlgorithm(QgsProcessingAlgorithm):
+    """Generates a rectangle or oval around each point of the input layer"""
+    INPUT = 'INPUT'
+    SHAPE = 'SHAPE'
+    WIDTH = 'WIDTH'
+    HEIGHT = 'HEIGHT'
+    ROTATION = 'ROTATION'
+    SEGMENTS = 'SEGMENTS'
+    OUTPUT = 'OUTPUT'
+
+    def tr(self, message):
+        return QCoreApplication.translate('GenerateShapesAlgorithm', message)
+
+    def createInstance(self):
+        return GenerateShapesAlgorithm()
+
+    def name(self):
+        return 'generateshapes'
+
+    def displayName(self):
+        return self.tr(u"Generate rectangles/ovals from points")
+
+    def shortHelpString(self):
+        return self.tr(u"Creates a rectangle or oval around each point, for multipoints around each of their points. "
+                       u"For rectangles width and height are the size of the shape, for ovals they are the radii. "
+                       u"Rotation is clockwise in degrees. "
+                       u"All values can be taken from fields or expressions and are in layer units.")
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.INPUT, self.tr(u"Input layer"), [VectorPoint]))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.SHAPE, self.tr(u"Shape"), [self.tr(u"Rectangle"), self.tr(u"Oval")], defaultValue=0))
+
+        for name, description, default, definition in (
+                (self.WIDTH, self.tr(u"Width (x) or radius (x)"), 1.0, QgsPropertyDefinition.StandardPropertyTemplate.DoublePositive),
+                (self.HEIGHT, self.tr(u"Height (y) or radius (y)"), 1.0, QgsPropertyDefinition.StandardPropertyTemplate.DoublePositive),
+                (self.ROTATION, self.tr(u"Rotation"), 0.0, QgsPropertyDefinition.StandardPropertyTemplate.Rotation)):
+            parameter = QgsProcessingParameterNumber(name, description, NumberType.Double,
+                                                     defaultValue=default)
+            parameter.setIsDynamic(True)
+            parameter.setDynamicPropertyDefinition(QgsPropertyDefinition(name, description, definition))
+            parameter.setDynamicLayerParameterName(self.INPUT)
+            self.addParameter(parameter)
+
+        parameter = QgsProcessingParameterNumber(self.SEGMENTS, self.tr(u"Segments"),
+                                                 NumberType.Integer,
+                                                 defaultValue=50, minValue=MIN_SEGMENTS, maxValue=MAX_SEGMENTS)
+        parameter.setIsDynamic(True)
+        parameter.setDynamicPropertyDefinition(QgsPropertyDefinition(
+            self.SEGMENTS, self.tr(u"Segments"), QgsPropertyDefinition.StandardPropertyTemplate.IntegerPositiveGreaterZero))
+        parameter.setDynamicLayerParameterName(self.INPUT)
+        self.addParameter(parameter)
+
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT, self.tr(u"Shapes"), VectorPolygon))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        # the kernel loads NumPy, which QGIS should not pay for at startup
+        from .geometry_shapes_kernel import spec_array
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+
+        shape = OVAL if self.parameterAsEnum(parameters, self.SHAPE, context) == 1 else RECTANGLE
+        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT, context, source.fields(),
+                                               WkbType.Polygon, source.sourceCrs())
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        # static values, or a property to evaluate per feature
+        names = (self.WIDTH, self.HEIGHT, self.ROTATION, self.SEGMENTS)
+        values = {}
+        properties = {}
+        for name in names:
+            values[name] = self.parameterAsDouble(parameters, name, context)
+            if QgsProcessingParameters.isDynamic(parameters, name):
+                properties[name] = parameters[name]
+        expression_context = self.createExpressionContext(parameters, context, source)
+
+        total = 100.0 / source.featureCount() if source.featureCount() else 0
+        # the points of a chunk and their shapes as compact records, reused for every chunk
+        chunk = []
+        specs = spec_array(CHUNK_SIZE)
+        for current, feature in enumerate(source.getFeatures()):
+            if feedback.isCanceled():
+                break
+            if not feature.hasGeometry():
+                continue
+
+            if properties:
+                expression_context.setFeature(feature)
+            dimensions = []
+            for name in names:
+                if name in properties:
+                    value, _ = properties[name].valueAsDouble(expression_context, values[name])
+                else:
+                    value = values[name]
+                dimensions.append(value)
+
+            # a shape for every point of a multipoint, each with the attributes of the feature
+            for point in feature.geometry().vertices():
+                specs[len(chunk)] = (feature.id(), shape, point.x(), point.y(), *dimensions)
+                chunk.append(feature)
+
+                if len(chunk) == CHUNK_SIZE:
+                    self.write_chunk(sink, chunk, specs, parameters)
+                    chunk = []
+                    feedback.setProgress(int(current * total))
+
+        if chunk and not feedback.isCanceled():
+            self.write_chunk(sink, chunk, specs[:len(chunk)], parameters)
+        feedback.setProgress(100)
+
+        return {self.OUTPUT: dest_id}
+
+    def write_chunk(self, sink, chunk, specs, parameters):
+        """Builds the shapes of a chunk of points at once from their records and writes them to the sink"""
+        from .geometry_shapes_kernel import spec_array_wkb
+        wkbs = spec_array_wkb(specs)
+
+        features = []
+        for point_feature, wkb in zip(chunk, wkbs):
+            geometry = QgsGeometry()
+            geometry.fromWkb(wkb)
+            feature = QgsFeature(point_feature)
+            feature.setGeometry(geometry)
+            features.append(feature)
+        if not sink.addFeatures(features, QgsFeatureSink.Flag.FastInsert):
+            raise QgsProcessingException(self.writeFeatureError(sink, parameters, self.OUTPUT))
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Optional wall time measurements of the stages of the map tools. Profiling is off by default
+ and is switched on with the 'GeometryShapes/profiling' setting; the timings are written to
+ the message log, or to the JSON file in the 'GeometryShapes/profiling_file' setting.
+"""
+import json
+import time
+from collections import deque
+
+from qgis.PyQt.QtCore import QSettings
+from qgis.core import Qgis, QgsMessageLog
+
+# upper bounds of the histogram buckets in milliseconds, the last bucket has no upper bound
+BUCKETS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+# number of timings kept per stage
+WINDOW = 1000
+
+
+class NullStage:
+    """Stage that measures nothing, shared by all calls while profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage:
+    """Measures the wall time of a with block and records it for a stage"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Keeps the latest WINDOW wall times of each stage. While disabled, stage() returns a shared
+    no-op context manager, so an instrumented block only costs a method call.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.enabled = False
+        self.path = ''
+        self.timings = {}
+
+    def load_settings(self):
+        """Reads whether profiling is enabled and where the timings are written to"""
+        settings = QSettings()
+        self.enabled = settings.value('GeometryShapes/profiling', False, type=bool)
+        self.path = settings.value('GeometryShapes/profiling_file', '', type=str)
+
+    def stage(self, name):
+        """
+        Returns a context manager that measures the wall time of a stage
+
+        :type name: str
+        """
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def now(self):
+        """Returns the current time to measure a stage that does not fit in a with block, or None if disabled"""
+        return time.perf_counter() if self.enabled else None
+
+    def since(self, name, start):
+        """Records the time since a start time from now(), nothing is recorded if it is None"""
+        if start is not None and self.enabled:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        timings = self.timings.get(name)
+        if timings is None:
+            timings = self.timings[name] = deque(maxlen=self.window)
+        timings.append(seconds * 1000)
+
+    def statistics(self):
+        """
+        Returns the count, median, 95th percentile, maximum and histogram of the timings in milliseconds per stage
+
+        :rtype: dict
+        """
+        result = {}
+        for name, timings in self.timings.items():
+            values = sorted(timings)
+            if not values:
+                continue
+            histogram = [0] * (len(BUCKETS) + 1)
+            bucket = 0
+            for value in values:
+                while bucket < len(BUCKETS) and value > BUCKETS[bucket]:
+                    bucket += 1
+                histogram[bucket] += 1
+            result[name] = {
+                'count': len(values),
+                'median_ms': values[len(values) // 2],
+                'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))],
+                'max_ms': values[-1],
+                'buckets_ms': list(BUCKETS),
+                'histogram': histogram,
+            }
+        return result
+
+    def report(self):
+        """Writes the statistics of all stages to the JSON file, or to the message log if there is no (writable) file"""
+        if not self.timings:
+            return
+        statistics = self.statistics()
+        if self.path:
+            try:
+                with open(self.path, 'w') as f:
+                    json.dump(statistics, f, indent=2)
+                return
+            except OSError as e:
+                # e.g. a path in a folder that does not exist, log the statistics instead
+                QgsMessageLog.logMessage('Can not write the profile to {}: {}'.format(self.path, e),
+                                         'GeometryShapes', Qgis.Warning)
+
+        for name, stats in sorted(statistics.items()):
+            histogram = ' '.join('<={}:{}'.format(bound, count) for bound, count in zip(BUCKETS, stats['histogram']))
+            histogram += ' >{}:{}'.format(BUCKETS[-1], stats['histogram'][-1])
+            QgsMessageLog.logMessage('{}: n={} median={:.3f}ms p95={:.3f}ms max={:.3f}ms | {}'.format(
+                name, stats['count'], stats['median_ms'], stats['p95_ms'], stats['max_ms'], histogram),
+                'GeometryShapes', Qgis.Info)
+
+
+_profiler = None
+
+
+def profiler():
+    """Returns the profiler that is shared by the map tools"""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+        _profiler.load_settings()
+    return _profiler
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import math
+import time
+
+from qgis.PyQt.QtCore import QObject, QTimer
+
+
+class FrameScheduler(QObject):
+    """
+    Coalesces a flood of updates (e.g. mouse moves) into at most one callback per frame.
+    Only the latest value is kept, values that arrive in between are dropped.
+    """
+
+    def __init__(self, callback, rate=60, parent=None):
+        """
+        :param callback: function that is called with the latest value
+        :param rate: maximum number of callbacks per second, 0 or less for no throttling
+        :type rate: int
+        """
+        super(FrameScheduler, self).__init__(parent)
+        self.callback = callback
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lastFlush = 0.0
+        self.value = None
+        self.pending = False
+        self.received = 0
+        self.rendered = 0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    @property
+    def dropped(self):
+        """Number of values that were replaced by a newer one before they were rendered"""
+        return self.received - self.rendered - int(self.pending)
+
+    def schedule(self, value):
+        """Keep the value and render it now, or at the start of the next frame"""
+        self.received += 1
+        self.value = value
+        self.pending = True
+        if self.timer.isActive():
+            return
+
+        wait = self.lastFlush + self.interval - time.perf_counter()
+        if wait <= 0:
+            self.flush()
+        else:
+            self.timer.start(int(math.ceil(wait * 1000)))
+
+    def flush(self):
+        """Render the pending value, if any"""
+        self.timer.stop()
+        if not self.pending:
+            return
+
+        value = self.value
+        self.value = None
+        self.pending = False
+        self.lastFlush = time.perf_counter()
+        self.rendered += 1
+        self.callback(value)
+
+    def cancel(self):
+        """Discard the pending value"""
+        self.timer.stop()
+        self.value = None
+        self.pending = False
+
+    def reset_statistics(self):
+        self.received = int(self.pending)
+        self.rendered = 0
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Optional staging of new shapes. While staging is on, the map tools add their shapes to a memory
+ layer that is shown on top of the map instead of to the target layer. Flushing adds all staged
+ shapes to the target layer with one addFeatures call and commits them, so the provider writes
+ them in one transaction instead of one edit per shape.
+"""
+from qgis.PyQt.QtCore import QSettings, QCoreApplication
+from qgis.core import Qgis, QgsMemoryProviderUtils, QgsProject
+
+from .geometry_shapes_cache import intersection_index
+
+
+def tr(message):
+    return QCoreApplication.translate('GeometryShapes', message)
+
+
+class StagingLayer:
+    """Memory layer with the fields, geometry type and CRS of a target layer, holding the staged shapes"""
+
+    def __init__(self, target):
+        """
+        :param target: layer the staged shapes are flushed to
+        :type target: qgis.core.QgsVectorLayer
+        """
+        self.target = target
+        self.layer = QgsMemoryProviderUtils.createMemoryLayer(tr(u"{} (staged)").format(target.name()),
+                                                              target.fields(), target.wkbType(), target.crs())
+        if target.renderer() is not None:
+            self.layer.setRenderer(target.renderer().clone())
+        # on top of the other layers, so the staged shapes are always visible
+        project = QgsProject.instance()
+        project.addMapLayer(self.layer, False)
+        project.layerTreeRoot().insertLayer(0, self.layer)
+
+    def add_features(self, features):
+        """
+        Stages features of the target layer
+
+        :type features: list[qgis.core.QgsFeature]
+        :rtype: bool
+        """
+        # straight to the provider, a memory layer needs no edit buffer
+        result, added = self.layer.dataProvider().addFeatures(features)
+        # the staged shapes are neighbours of the next shapes when avoiding intersections
+        intersection_index(self.layer).features_added(added)
+        self.layer.triggerRepaint()
+        return result
+
+    def feature_count(self):
+        return self.layer.dataProvider().featureCount()
+
+    def move_to_target(self):
+        """
+        Adds the staged shapes to the edit buffer of the (editable) target layer in one edit command
+
+        :return: number of shapes moved
+        :rtype: int
+        """
+        features = list(self.layer.dataProvider().getFeatures())
+        if features:
+            self.target.beginEditCommand(tr(u"Add staged shapes"))
+            self.target.addFeatures(features)
+            self.target.endEditCommand()
+        return len(features)
+
+
+class Staging:
+    """
+    The staging layers of the target layers, and whether the map tools stage their shapes. Staging is
+    off by default and is switched on with the 'GeometryShapes/staging' setting.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.layers = {}
+
+    def load_settings(self):
+        self.enabled = QSettings().value('GeometryShapes/staging', False, type=bool)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        QSettings().setValue('GeometryShapes/staging', enabled)
+
+    def staging_layer(self, target, create=False):
+        """
+        Returns the staging layer of a target layer, or None if nothing has been staged for it
+
+        :type target: qgis.core.QgsVectorLayer
+        :param create: create the staging layer if there is none
+        :rtype: StagingLayer
+        """
+        layer_id = target.id()
+        staged = self.layers.get(layer_id)
+        if staged is None and create:
+            staged = StagingLayer(target)
+            self.layers[layer_id] = staged
+            # forget the staged shapes if the user removes the staging layer or the target layer
+            staged.layer.willBeDeleted.connect(lambda: self.layers.pop(layer_id, None))
+            target.willBeDeleted.connect(lambda: self.discard(layer_id))
+        return staged
+
+    def staging_layers(self, targets):
+        """
+        Returns the staging layers of the target layers that have staged shapes
+
+        :type targets: list[qgis.core.QgsVectorLayer]
+        :rtype: list[qgis.core.QgsVectorLayer]
+        """
+        result = []
+        for target in targets:
+            staged = self.layers.get(target.id()) if target is not None else None
+            if staged is not None:
+                result.append(staged.layer)
+        return result
+
+    def add_features(self, target, features):
+        """
+        Stages features of a target layer
+
+        :type target: qgis.core.QgsVectorLayer
+        :type features: list[qgis.core.QgsFeature]
+        :rtype: bool
+        """
+        return self.staging_layer(target, create=True).add_features(features)
+
+    def feature_count(self):
+        return sum(staged.feature_count() for staged in self.layers.values())
+
+    def flush(self):
+        """
+        Adds the staged shapes to their target layers and commits each target layer once, the target
+        layers stay in edit mode. The commit saves the whole edit buffer, so shapes are only flushed
+        into layers that are in edit mode and have no other unsaved edits; otherwise they stay staged.
+
+        :return: the number of shapes flushed and the errors
+        :rtype: (int, list[str])
+        """
+        count = 0
+        errors = []
+        for layer_id, staged in list(self.layers.items()):
+            target = staged.target
+            if not target.isEditable():
+                errors.append(tr(u"{} is not in edit mode").format(target.name()))
+                continue
+            if target.isModified():
+                errors.append(tr(u"{} has unsaved edits, save or discard them first").format(target.name()))
+                continue
+
+            count += staged.move_to_target()
+            self.discard(layer_id)
+            # the edit buffer hands all added features to the provider at once, in one transaction
+            if Qgis.versionInt() >= 31600:
+                committed = target.commitChanges(False)
+            else:
+                committed = target.commitChanges() and target.startEditing()
+            if not committed:
+                errors.extend(target.commitErrors())
+        return count, errors
+
+    def discard(self, layer_id):
+        """Removes the staging layer of a target layer and its staged shapes"""
+        staged = self.layers.pop(layer_id, None)
+        if staged is not None:
+            QgsProject.instance().removeMapLayer(staged.layer.id())
+
+
+_staging = None
+
+
+def staging():
+    """Returns the staging of new shapes that is shared by the map tools"""
+    global _staging
+    if _staging is None:
+        _staging = Staging()
+        _staging.load_settings()
+    return _staging
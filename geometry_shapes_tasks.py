@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeometryShapes
+                                 A QGIS plugin
+ This plugin draws basic geometry shapes with user defined measurements
+                              -------------------
+        begin                : 2026-10-18
+        git sha              : $Format:%H$
+        copyright            : (C) 2021-2026 by P. van de Geer
+        email                : pvandegeer@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Background tasks, so the map tools never wait for GEOS or for reading a whole layer on the main thread.
+"""
+from qgis.core import Qgis, QgsApplication, QgsFeatureRequest, QgsGeometry, QgsSpatialIndex, QgsTask, \
+    QgsVectorLayerFeatureSource
+
+from .geometry_shapes_cache import clip
+
+# running tasks, a task must stay referenced from Python until it has finished
+_running = set()
+
+
+class ClipTask(QgsTask):
+    """
+    Clips shapes by snapshots of their neighbour geometries in a worker thread. The callback is called
+    on the main thread with the clipped geometries; if the task is canceled the optional failed
+    function is called instead.
+    """
+
+    def __init__(self, geometries, candidates, callback, failed=None):
+        """
+        :param geometries: shapes in the CRS of the target layer
+        :type geometries: list[qgis.core.QgsGeometry]
+        :param candidates: neighbour geometries of each shape in the CRS of the target layer
+        :type candidates: list[list[qgis.core.QgsGeometry]]
+        :param callback: function that takes the list of clipped geometries
+        :param failed: optional function without arguments
+        """
+        flags = QgsTask.Flag.CanCancel
+        if Qgis.versionInt() >= 31200:
+            # no notification for every mouse move
+            flags |= QgsTask.Flag.Silent
+        super(ClipTask, self).__init__(u"Avoid intersections", flags)
+        # copies, the originals stay with the main thread
+        self.geometries = [QgsGeometry(geometry) for geometry in geometries]
+        self.candidates = [[QgsGeometry(candidate) for candidate in group] for group in candidates]
+        self.callback = callback
+        self.failed = failed
+        self.result = []
+
+    def run(self):
+        for geometry, candidates in zip(self.geometries, self.candidates):
+            clipped = clip(geometry, candidates, self.isCanceled)
+            if clipped is None or self.isCanceled():
+                return False
+            self.result.append(clipped)
+        return True
+
+    def finished(self, result):
+        _running.discard(self)
+        if result:
+            self.callback(self.result)
+        elif self.failed is not None:
+            self.failed()
+
+
+class IndexTask(QgsTask):
+    """
+    Builds the bounding box index of a snapshot of the features of a layer in a worker thread. The callback
+    is called on the main thread with the task, the spatial index and the boxes by feature id; if the task
+    is canceled or fails the optional failed function is called with the task instead.
+    """
+
+    def __init__(self, layer, callback, failed=None):
+        """
+        :type layer: qgis.core.QgsVectorLayer
+        :param callback: function that takes the task, the index and the boxes
+        :param failed: optional function that takes the task
+        """
+        flags = QgsTask.Flag.CanCancel
+        if Qgis.versionInt() >= 31200:
+            flags |= QgsTask.Flag.Silent
+        super(IndexTask, self).__init__(u"Index {}".format(layer.name()), flags)
+        # created on the main thread, includes the edit buffer of the layer at this moment
+        self.source = QgsVectorLayerFeatureSource(layer)
+        self.callback = callback
+        self.failed = failed
+        self.index = None
+        self.boxes = {}
+
+    def run(self):
+        self.index = QgsSpatialIndex()
+        request = QgsFeatureRequest().setNoAttributes()
+        for feature in self.source.getFeatures(request):
+            if self.isCanceled():
+                return False
+            if feature.hasGeometry():
+                box = feature.geometry().boundingBox()
+                self.boxes[feature.id()] = box
+                self.index.addFeature(feature.id(), box)
+        return True
+
+    def finished(self, result):
+        _running.discard(self)
+        if result:
+            self.callback(self, self.index, self.boxes)
+        elif self.failed is not None:
+            self.failed(self)
+
+
+def start_index(layer, callback, failed=None):
+    """
+    Starts building the bounding box index of a layer in the background and returns the task
+
+    :rtype: IndexTask
+    """
+    task = IndexTask(layer, callback, failed)
+    _running.add(task)
+    QgsApplication.taskManager().addTask(task)
+    return task
+
+
+def start_clip(geometries, candidates, callback, failed=None):
+    """
+    Starts clipping shapes in the background and returns the task, cancel it when the result is no longer needed
+
+    :rtype: ClipTask
+    """
+    task = ClipTask(geometries, candidates, callback, failed)
+    _running.add(task)
+    QgsApplication.taskManager().addTask(task)
+    return task
@@ -22,34 +22,129 @@
  ***************************************************************************/
 """
 import math
+from collections import deque
+
+from qgis.PyQt.QtCore import Qt, QPoint, QSettings, QCoreApplication
+from qgis.PyQt.QtWidgets import QApplication, QProgressDialog, QToolTip
+from qgis.core import Qgis, QgsApplication, QgsFeature, \
+    QgsGeometry, QgsMapLayer, QgsMessageLog, QgsPointXY, QgsProject, QgsRectangle, QgsUnitTypes, QgsWkbTypes
+from qgis.gui import QgsMapTool, QgsAttributeEditorContext, QgsMessageBar, QgsRubberBand # noqa: F401
+
+from .geometry_shapes_cache import default_values, intersection_index, is_polygon_layer, neighbours, \
+    transform_cache, transform_polygons_wkb
+from .geometry_shapes_canvas_item import ShapePreviewItem, preview_style
+from .geometry_shapes_kernel import OVAL, RECTANGLE, curve_polygon_wkb, grid_centers, oval_arc_coords, \
+    oval_coords, polygon_wkb, rectangle_coords, segments_for_tolerance, shapes_wkb
+from .geometry_shapes_profiler import profiler
+from .geometry_shapes_scheduler import FrameScheduler
+from .geometry_shapes_staging import staging
+from .geometry_shapes_tasks import start_clip
 
-from qgis.PyQt.QtCore import Qt, QSettings, QCoreApplication
-from qgis.PyQt.QtGui import QColor
-from qgis.PyQt.QtWidgets import QApplication, QToolTip
-from qgis.core import Qgis, QgsApplication, QgsCoordinateTransform, QgsExpression, QgsFeature, \
-    QgsGeometry, QgsMapLayer, QgsPointXY, QgsProject, QgsRectangle, QgsUnitTypes, QgsWkbTypes
-from qgis.gui import QgsMapTool, QgsRubberBand, QgsAttributeEditorContext, QgsMessageBar # noqa: F401
-from qgis.utils import iface
+GeometryType = QgsWkbTypes.GeometryType
 
-from .geometry_shapes_dialog import GeometryShapesDialog
+# number of grid cells that are built and added to the layer at once
+GRID_CHUNK_SIZE = 10000
 
-GeometryType = QgsWkbTypes.GeometryType
+# distance in pixels of the dimensions panel to the corner of the map canvas
+DIMENSIONS_MARGIN = 10
+
+# draw a single shape, a grid of shapes, or stamp shapes of a fixed size with single clicks
+MODE_DRAW = 0
+MODE_GRID = 1
+MODE_STAMP = 2
+
+
+def qgis_interface():
+    """
+    Returns the QGIS interface. It is looked up when needed, so this module can be imported
+    without a GUI, e.g. by batch jobs; there is no interface then.
+
+    :rtype: qgis.gui.QgisInterface
+    """
+    from qgis.utils import iface
+    return iface
+
+
+def geometry_from_wkb(wkb):
+    """
+    Returns a QgsGeometry created directly from WKB bytes, e.g. from the shape kernel
+
+    :type wkb: bytes
+    :rtype: qgis.core.QgsGeometry
+    """
+    geometry = QgsGeometry()
+    geometry.fromWkb(wkb)
+    return geometry
+
+
+def supports_curves(layer):
+    """
+    Returns True if the layer can store curved geometries (e.g. CurvePolygon or MultiSurface)
+
+    :type layer: qgis.core.QgsMapLayer
+    :rtype: bool
+    """
+    return layer is not None and layer.type() == QgsMapLayer.LayerType.VectorLayer and \
+        QgsWkbTypes.isCurvedType(layer.wkbType())
 
 
 class GeometryTool(QgsMapTool):
-    def __init__(self, canvas):
+    shape = RECTANGLE
+
+    def __init__(self, canvas, mode=MODE_DRAW):
         QgsMapTool.__init__(self, canvas)
-        self.dlg = GeometryShapesDialog()
+        self.mode = mode
+        self.stampOffset = None
         self.capturing = False
         self.startPoint = None
         self.endPoint = None
-        self.rubberBand = None
-        self.helperBand = None
+        self.previewItem = None
+        self.clipBand = None
         self.canvas = canvas
+        # background clipping of the preview by its neighbours, the key is that of the clipped shape
+        self.clipTask = None
+        self.clipGeneration = 0
+        self.clipKey = None
+        self.clipResult = None
+        # shapes waiting to be clipped and added to their layer, in order, and the running clip
+        self.commitQueue = deque()
+        self.commitTask = None
+        self.widthLocked = False
+        self.heightLocked = False
+        # clockwise rotation of the shape around its center in degrees
+        self.shapeRotation = 0
+        # optional timings of the stages, a no-op unless enabled in the settings
+        self.profiler = profiler()
+        self.dialogStart = None
+
+        # render the preview at most once per frame, no matter how many mouse events come in
+        rate = QSettings().value('GeometryShapes/preview_rate', 60, type=int)
+        self.scheduler = FrameScheduler(self.update_preview, rate)
 
         cursor = QgsApplication.getThemeCursor(QgsApplication.Cursor.CapturePoint)
         self.setCursor(cursor)
 
+    @property
+    def dlg(self):
+        """The dimensions panel, one dialog is shared by all tools and created on first use"""
+        from .geometry_shapes_dialog import shared_dialog
+        return shared_dialog()
+
+    def connect_dialog(self, connect=True):
+        """Connects the shared dialog to this tool while it is active, or disconnects it"""
+        for signal, slot in ((self.dlg.accepted, self.stop_capturing),
+                             (self.dlg.rejected, self.reset),
+                             (self.dlg.width.lineEdit().textEdited, self.lock_width),
+                             (self.dlg.height.lineEdit().textEdited, self.lock_height),
+                             (self.dlg.rotation.valueChanged, self.set_rotation)):
+            if connect:
+                signal.connect(slot)
+            else:
+                try:
+                    signal.disconnect(slot)
+                except (TypeError, RuntimeError):
+                    pass
+
     @property
     def avoidIntersectionsMode(self):
         if Qgis.versionInt() < 32600:
@@ -69,160 +164,266 @@ class GeometryTool(QgsMapTool):
         return True
 
     def reset(self):
+        self.scheduler.cancel()
         self.capturing = False
         self.startPoint = None
         self.endPoint = None
-        if self.rubberBand is not None:
-            self.canvas.scene().removeItem(self.rubberBand)
-        if self.helperBand is not None:
-            self.canvas.scene().removeItem(self.helperBand)
-        self.rubberBand = None
-        self.helperBand = None
-        self.canvas.refresh()
+        self.dlg.hide()
+        self.cancel_clip()
+        if self.previewItem is not None:
+            self.previewItem.clear()
 
     def start_capturing(self):
-        """Capturing has started: setup the tool by initializing the rubber band and capturing mode"""
-        # apply application settings for the rubber band
-        settings = QSettings()
-        settings.beginGroup('qgis/digitizing')
-        line_width = settings.value('line_width', 1, type=int)
-        fill_color = QColor(settings.value('fill_color_red', 255, type=int),
-                            settings.value('fill_color_green', 0, type=int),
-                            settings.value('fill_color_blue', 0, type=int),
-                            settings.value('fill_color_alpha', 31, type=int))
-        line_color = QColor(settings.value('line_color_red', 255, type=int),
-                            settings.value('line_color_green', 0, type=int),
-                            settings.value('line_color_blue', 0, type=int),
-                            settings.value('line_color_alpha', 199, type=int))
-
-        self.rubberBand = QgsRubberBand(self.canvas, GeometryType.PolygonGeometry)
-        self.rubberBand.setColor(line_color)
-        self.rubberBand.setFillColor(fill_color)
-        self.rubberBand.setWidth(line_width)
-        self.helperBand = QgsRubberBand(self.canvas, GeometryType.PolygonGeometry)
-        self.helperBand.setColor(Qt.GlobalColor.gray)
-        self.helperBand.setFillColor(QColor(0, 0, 0, 0))
-        self.helperBand.setWidth(line_width)
+        """Capturing has started: setup the tool by initializing the preview item and capturing mode"""
+        self.preview_item().set_rotation(self.shapeRotation)
 
         self.capturing = True
+        self.show_dimensions()
 
-    def stop_capturing(self):
+    def preview_item(self):
         """
-        Capturing will stop: adjust dimensions if needed and add feature to
-        to the active layer.
+        Returns the preview item of the tool, it is created once and reused for every shape until
+        the tool is deactivated. The digitizing style is a snapshot that is reloaded when the
+        QGIS options change.
+
+        :rtype: ShapePreviewItem
         """
-        self.capturing = False
+        if self.previewItem is None:
+            self.previewItem = ShapePreviewItem(self.canvas, self.shape)
+            self.previewItem.hide()
+            # the shape clipped by its neighbours, if the project avoids intersections
+            self.clipBand = QgsRubberBand(self.canvas, GeometryType.PolygonGeometry)
+        style = preview_style()
+        if self.previewItem.styleVersion != style.version:
+            self.clipBand.setStrokeColor(style.lineColor)
+            self.clipBand.setFillColor(style.fillColor)
+            self.clipBand.setWidth(style.lineWidth)
+        self.previewItem.apply_style(style)
+        return self.previewItem
+
+    def show_dimensions(self):
+        """
+        Show the dimensions panel on the map canvas. It is not modal: its values follow the mouse
+        until they are typed in, a typed in value is kept while the mouse moves.
+        """
+        self.widthLocked = False
+        self.heightLocked = False
+
+        # the dialog is used as a non-modal dimensions panel on top of the map canvas
+        if self.dlg.parent() is not self.canvas:
+            self.dlg.setParent(self.canvas, Qt.WindowType.Widget)
+            self.dlg.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating)
+            self.dlg.setAutoFillBackground(True)
+        self.dlg.label.setText(self.tr(u"Width (x)", 'GeometryTool'))
+        self.dlg.label_2.setText(self.tr(u"Height (y)", 'GeometryTool'))
+
+        # show the dimensions in the project distance units
+        suffix = ' {}'.format(QgsUnitTypes.toAbbreviatedString(QgsProject.instance().distanceUnits()))
+        for spin_box in (self.dlg.width, self.dlg.height, self.dlg.spacing_x, self.dlg.spacing_y):
+            spin_box.setSuffix(suffix)
+        self.dlg.width.setValue(0)
+        self.dlg.height.setValue(0)
 
-        # cache start- and endpoints as in case the tool disappears
-        # before the dialog is closed, so we can still access them
-        startpoint = QgsPointXY(self.startPoint.x(), self.startPoint.y())
-        endpoint = QgsPointXY(self.endPoint.x(), self.endPoint.y())
+        enable_segments = self.__class__.__name__ == 'OvalGeometryTool'
+        adaptive = self.dlg.adaptive.isChecked()
+        self.dlg.label_segments.setEnabled(enable_segments)
+        self.dlg.segments.setEnabled(enable_segments and not adaptive)
+        self.dlg.adaptive.setEnabled(enable_segments)
+        self.dlg.tolerance.setEnabled(enable_segments and adaptive)
+        self.dlg.curved.setEnabled(enable_segments and supports_curves(self.canvas.currentLayer()))
+        self.dlg.grid.setVisible(self.mode == MODE_GRID)
+
+        self.dlg.adjustSize()
+        self.dlg.move(DIMENSIONS_MARGIN, DIMENSIONS_MARGIN)
+        self.dlg.show()
+        self.dialogStart = self.profiler.now()
+        # keep the keyboard on the canvas, typing a number moves it to the panel
+        self.canvas.setFocus()
 
+    def update_dimensions(self):
+        """Show the size of the shape under the mouse in the dimensions that are not typed in"""
         rect = self.selection_rect()
-        if not rect:
-            self.reset()
+        if rect is None:
             return
+        conversion_factor = self.conversion_factor()
+        if not self.widthLocked:
+            self.dlg.width.setValue(rect.width() * conversion_factor)
+        if not self.heightLocked:
+            self.dlg.height.setValue(rect.height() * conversion_factor)
 
-        # convert the rectangle dimensions to the project distance units
-        map_units = self.canvas.mapUnits()
-        project_units = QgsProject.instance().distanceUnits()
-        conversion_factor = QgsUnitTypes.fromUnitToUnitFactor(map_units, project_units)
-        rect_width = rect.width() * conversion_factor
-        rect_height = rect.height() * conversion_factor
+    def lock_width(self):
+        self.widthLocked = True
 
-        title = '{} ({})'.format(self.tr(u"Set size", 'GeometryTool'), QgsUnitTypes.toString(project_units))
-        self.dlg.setWindowTitle(title)
-        self.dlg.width.setValue(rect_width)
-        self.dlg.height.setValue(rect_height)
+    def lock_height(self):
+        self.heightLocked = True
 
-        enable_segments = self.__class__.__name__ == 'OvalGeometryTool'
-        self.dlg.label_segments.setEnabled(enable_segments)
-        self.dlg.segments.setEnabled(enable_segments)
+    def set_rotation(self, rotation):
+        """
+        Sets the clockwise rotation of the shape in degrees
 
-        self.dlg.show()
-        result = self.dlg.exec()
-
-        if result:
-            # check for a valid result from the dialog
-            if self.dlg.width.value() <= 0 or self.dlg.height.value() <= 0:
-                iface.messageBar().pushMessage(self.tr(u"Add feature", 'GeometryTool'),
-                    self.tr(u"Invalid dimensions (must be numeric and greater than zero)", 'GeometryTool'),
-                    level=Qgis.Warning, duration=5)
-                self.reset()
-                return
+        :type rotation: int
+        """
+        self.shapeRotation = rotation
+        if self.previewItem is not None:
+            self.previewItem.set_rotation(rotation)
 
-            # retrieve cached start- and endpoint
-            self.startPoint = startpoint
-            self.endPoint = endpoint
-            # convert the dimensions back to the map units
-            dialog_width = self.dlg.width.value() / conversion_factor
-            dialog_height = self.dlg.height.value() / conversion_factor
-            # adjust the endPoint based on the startPoint and dialog dimensions
-            if self.startPoint.x() < self.endPoint.x():
-                self.endPoint.setX(self.startPoint.x() + dialog_width)
-            else:
-                self.endPoint.setX(self.startPoint.x() - dialog_width)
+    def conversion_factor(self):
+        """Returns the factor to convert map units to the project distance units"""
+        return QgsUnitTypes.fromUnitToUnitFactor(self.canvas.mapUnits(), QgsProject.instance().distanceUnits())
+
+    def stop_capturing(self):
+        """
+        Capturing will stop: adjust dimensions to the values of the dimensions panel and add
+        the feature to the active layer.
+        """
+        if not self.capturing:
+            return
+        self.capturing = False
+        self.scheduler.cancel()
+        self.dlg.hide()
+        self.profiler.since('dialog', self.dialogStart)
 
-            if self.startPoint.y() < self.endPoint.y():
-                self.endPoint.setY(self.startPoint.y() + dialog_height)
+        # clicked twice at the same point without typing a dimension: nothing to add, no warning
+        if self.selection_rect() is None and not (self.widthLocked or self.heightLocked):
+            self.reset()
+            return
+
+        # check for valid dimensions
+        if self.dlg.width.value() <= 0 or self.dlg.height.value() <= 0:
+            qgis_interface().messageBar().pushMessage(self.tr(u"Add feature", 'GeometryTool'),
+                self.tr(u"Invalid dimensions (must be numeric and greater than zero)", 'GeometryTool'),
+                level=Qgis.Warning, duration=5)
+            self.reset()
+            return
+
+        # convert the dimensions back to the map units
+        conversion_factor = self.conversion_factor()
+        dialog_width = self.dlg.width.value() / conversion_factor
+        dialog_height = self.dlg.height.value() / conversion_factor
+        # adjust the endPoint to the typed in dimensions only: the others are the rounded mouse position,
+        # the exact end point keeps the shape of the preview and so its clipped result
+        x = self.endPoint.x()
+        if self.widthLocked:
+            if self.startPoint.x() <= self.endPoint.x():
+                x = self.startPoint.x() + dialog_width
             else:
-                self.endPoint.setY(self.startPoint.y() - dialog_height)
+                x = self.startPoint.x() - dialog_width
 
-            self.add_feature_to_layer()
+        y = self.endPoint.y()
+        if self.heightLocked:
+            if self.startPoint.y() <= self.endPoint.y():
+                y = self.startPoint.y() + dialog_height
+            else:
+                y = self.startPoint.y() - dialog_height
+        self.endPoint = QgsPointXY(x, y)
+
+        if self.mode == MODE_STAMP:
+            # keep the size for the next shapes, they are placed with a single click
+            self.stampOffset = (self.endPoint.x() - self.startPoint.x(), self.endPoint.y() - self.startPoint.y())
+            self.stamp(self.startPoint)
+        elif self.mode == MODE_GRID:
+            self.add_grid_to_layer(self.dlg.rows.value(), self.dlg.columns.value(),
+                                   self.dlg.spacing_x.value() / conversion_factor,
+                                   self.dlg.spacing_y.value() / conversion_factor)
         else:
-            self.reset()
+            self.add_feature_to_layer()
 
     def canvasReleaseEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
             # there must be an active polygon layer
             layer = self.canvas.currentLayer()
-            if not layer or layer.type() != QgsMapLayer.LayerType.VectorLayer or layer.geometryType() != GeometryType.PolygonGeometry:
-                iface.messageBar().pushInfo(self.tr(u"Add feature", 'GeometryTool'), self.tr(u"No active polygon layer", 'GeometryTool'))
+            if not is_polygon_layer(layer):
+                qgis_interface().messageBar().pushInfo(self.tr(u"Add feature", 'GeometryTool'), self.tr(u"No active polygon layer", 'GeometryTool'))
                 return
 
-            if not self.capturing:
-                self.start_capturing()
+            if self.stampOffset is not None:
+                self.stamp(self.toMapCoordinates(event.pos()))
+            elif not self.capturing:
                 self.startPoint = self.toMapCoordinates(event.pos())
                 self.endPoint = self.startPoint
+                self.start_capturing()
             else:
-                self.capture_position(event)
+                self.scheduler.cancel()
+                self.capture_position(event.pos())
+                self.update_dimensions()
                 self.stop_capturing()
         elif event.button() == Qt.MouseButton.RightButton:
+            self.end_stamp()
             self.reset()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Escape:
+            self.end_stamp()
             self.reset()
+        elif self.capturing and event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+            # like the second click, at the position of the preview
+            self.stop_capturing()
+        elif self.capturing and event.text() and event.text() in '0123456789.,':
+            # start typing the width in the dimensions panel
+            self.dlg.width.setFocus()
+            self.dlg.width.selectAll()
+            self.dlg.width.lineEdit().insert(event.text())
+            self.lock_width()
 
     def canvasMoveEvent(self, event):
-        if self.capturing:
-            self.capture_position(event)
+        if self.capturing or self.stampOffset is not None:
+            # only keep the latest position, the preview is updated once per frame
+            self.scheduler.schedule(QPoint(event.pos()))
+
+    def update_preview(self, pos):
+        """
+        Update the preview, dimensions and tooltip for the latest mouse position
+
+        :type pos: QPoint
+        """
+        if self.stampOffset is not None:
+            self.set_stamp_points(self.toMapCoordinates(pos))
             self.show_rubberband()
+            self.update_clip_preview()
+            return
+        if not self.capturing:
+            return
+
+        with self.profiler.stage('move'):
+            self.capture_position(pos)
+            with self.profiler.stage('rubberband'):
+                self.show_rubberband()
+            self.update_clip_preview()
+            self.update_dimensions()
 
             if self.canvas.underMouse():
                 rect = self.selection_rect()
                 if rect is not None:
-                    QToolTip.showText(self.canvas.mapToGlobal(self.canvas.mouseLastXY()),
-                                      self.tooltip_text(rect),
-                                      self.canvas)
+                    with self.profiler.stage('tooltip'):
+                        QToolTip.showText(self.canvas.mapToGlobal(self.canvas.mouseLastXY()),
+                                          self.tooltip_text(rect),
+                                          self.canvas)
 
-    def capture_position(self, event):
+    def capture_position(self, pos):
         """
         Record the position of the mouse pointer and adjust if keyboard modifier is pressed
+        or dimensions have been typed in. With Ctrl pressed the mouse rotates the shape instead.
 
-        :type event: qgis.gui.QgsMapMouseEvent
+        :param pos: position of the mouse pointer in canvas pixels
+        :type pos: QPoint
         """
+        end_point = QgsPointXY(self.toMapCoordinates(pos))
+
+        # rotate the shape around its center towards the mouse, its size stays the same
+        if QApplication.keyboardModifiers() == Qt.KeyboardModifier.ControlModifier and self.selection_rect() is not None:
+            cx, cy = self.cell()[:2]
+            angle = math.degrees(math.atan2(end_point.y() - cy, end_point.x() - cx))
+            self.dlg.rotation.setValue(round(-angle) % 360)
+            return
+
         # adjust dimension on the fly if Shift is pressed
         if QApplication.keyboardModifiers() == Qt.KeyboardModifier.ShiftModifier:
-            end_point = QgsPointXY(self.toMapCoordinates(event.pos()))
             rect = QgsRectangle(self.startPoint, end_point)
 
-            # return if start and endpoint are the same
+            # nothing to adjust if start and endpoint are the same
             if rect.width() + rect.height() == 0:
-                self.endPoint = self.toMapCoordinates(event.pos())
-                return
-
-            if rect.width() > rect.height():
+                pass
+            elif rect.width() > rect.height():
                 # make height (y) same as width in the correct direction
                 if self.startPoint.y() < end_point.y():
                     end_point.setY(self.startPoint.y() + rect.width())
@@ -235,43 +436,279 @@ class GeometryTool(QgsMapTool):
                 else:
                     end_point.setX(self.startPoint.x() - rect.height())
 
-            self.endPoint = end_point
-        else:
-            self.endPoint = self.toMapCoordinates(event.pos())
+        # typed in dimensions are fixed, the mouse only sets the direction
+        conversion_factor = self.conversion_factor()
+        if self.widthLocked:
+            width = self.dlg.width.value() / conversion_factor
+            end_point.setX(self.startPoint.x() + math.copysign(width, end_point.x() - self.startPoint.x()))
+        if self.heightLocked:
+            height = self.dlg.height.value() / conversion_factor
+            end_point.setY(self.startPoint.y() + math.copysign(height, end_point.y() - self.startPoint.y()))
+
+        self.endPoint = end_point
 
     def show_rubberband(self):
-        """
-         Draw to 'rubber band' to the map canvas as a preview of the shape
+        """Draw the preview of the shape and its helper lines to the map canvas, in screen pixels"""
+        if self.startPoint.x() == self.endPoint.x() or self.startPoint.y() == self.endPoint.y():
+            return
 
-         *To be implemented by child class*
-         """
-        pass
+        self.previewItem.set_points(self.startPoint, self.endPoint)
+        self.previewItem.show()
 
     def add_feature_to_layer(self):
-        """Adds the just created shape to the active layer as a feature"""
-
+        """Adds the just created shape to the active layer as a feature, once it is clipped by its neighbours"""
         layer = self.canvas.currentLayer()
-        feature = QgsFeature(layer.fields())
-        feature.setGeometry(self.transformed_geometry(layer))
+        self.commit_shapes([self.shape_geometry(layer)], layer,
+                           lambda geometries: self.add_feature(layer, geometries[0]), self.shape_key(layer))
+        self.reset()
+
+    def add_feature(self, layer, geometry):
+        """
+        Adds a shape to the layer as a feature, through the feature form if the layer has attributes
 
+        :type layer: qgis.core.QgsVectorLayer
+        :param geometry: shape in the CRS of the layer
+        :type geometry: qgis.core.QgsGeometry
+        """
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(geometry)
+
+        if staging().enabled:
+            # no feature form, the attributes of staged shapes are edited after they are flushed
+            with self.profiler.stage('default_values'):
+                default_values(layer).apply(feature)
+            with self.profiler.stage('add_feature'):
+                staging().add_features(layer, [feature])
         # If the layer has attributes, set default attribute values and open the feature form for editing
-        if layer.fields().count():
-            for idx, field in enumerate(layer.fields()):
-                default_value = field.defaultValueDefinition().expression() if field.defaultValueDefinition().isValid() else None
-                if default_value:
-                    # Evaluate the default value expression in the context of the layer
-                    context = layer.createExpressionContext()
-                    value = QgsExpression(default_value).evaluate(context)
-                    feature.setAttribute(idx, value)
-
-            ff = iface.getFeatureForm(layer, feature)
+        elif layer.fields().count():
+            # Evaluate the (prepared) default value expressions in the context of the layer
+            with self.profiler.stage('default_values'):
+                default_values(layer).apply(feature)
+
+            ff = qgis_interface().getFeatureForm(layer, feature)
             ff.setMode(QgsAttributeEditorContext.AddFeatureMode)
-            ff.accepted.connect(self.reset)
-            ff.rejected.connect(self.reset)
             ff.show()
         else:
-            layer.addFeature(feature)
-            self.reset()
+            with self.profiler.stage('add_feature'):
+                layer.beginEditCommand(self.tr(u"Add feature", 'GeometryTool'))
+                layer.addFeature(feature)
+                layer.endEditCommand()
+            # repaint the target layer only, other layers are taken from the render cache
+            layer.triggerRepaint()
+
+    def stamp(self, point):
+        """
+        Adds a shape of the stamp size at the point to the active layer, without a feature form. Each
+        shape is its own undo command, so no command stays open while the user saves or undoes edits.
+
+        :type point: qgis.core.QgsPointXY
+        """
+        layer = self.canvas.currentLayer()
+        self.set_stamp_points(point)
+        self.commit_shapes([self.shape_geometry(layer)], layer,
+                           lambda geometries: self.add_stamped(layer, geometries[0]), self.shape_key(layer))
+        # the new shape is a neighbour of the next one, so the clipped preview is outdated
+        self.cancel_clip()
+
+    def add_stamped(self, layer, geometry):
+        """
+        Adds a stamped shape to the layer, or to its staging layer
+
+        :type layer: qgis.core.QgsVectorLayer
+        :param geometry: shape in the CRS of the layer
+        :type geometry: qgis.core.QgsGeometry
+        """
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(geometry)
+        with self.profiler.stage('default_values'):
+            default_values(layer).apply(feature)
+        with self.profiler.stage('add_feature'):
+            if staging().enabled:
+                staging().add_features(layer, [feature])
+            else:
+                layer.beginEditCommand(self.tr(u"Stamp shape", 'GeometryTool'))
+                layer.addFeature(feature)
+                layer.endEditCommand()
+                layer.triggerRepaint()
+
+    def set_stamp_points(self, point):
+        self.startPoint = QgsPointXY(point)
+        self.endPoint = QgsPointXY(point.x() + self.stampOffset[0], point.y() + self.stampOffset[1])
+
+    def end_stamp(self):
+        """Forgets the stamp size, the next shape sets a new one"""
+        self.stampOffset = None
+
+    def add_grid_to_layer(self, rows, columns, spacing_x, spacing_y):
+        """
+        Adds a grid of copies of the just created shape to the active layer, growing in the direction
+        it was drawn. The shapes are built and clipped in chunks, then added at once within a single undo
+        command and without feature forms. While staging, the shapes are added to the staging layer instead.
+
+        :param spacing_x: distance between two columns in map units
+        :param spacing_y: distance between two rows in map units
+        """
+        layer = self.canvas.currentLayer()
+        cx, cy, width, height, extent_x, extent_y = self.cell()
+        pitch_x = math.copysign(extent_x + spacing_x, self.endPoint.x() - self.startPoint.x())
+        pitch_y = math.copysign(extent_y + spacing_y, self.endPoint.y() - self.startPoint.y())
+        count = rows * columns
+        shape = self.shape
+        rotation = self.shapeRotation or None
+        segments = self.output_segments(layer)
+        source_crs = QgsProject.instance().crs()
+        transform = transform_cache().transform(source_crs, layer) if source_crs != layer.crs() else None
+
+        # the progress counts chunks, the number of cells may not fit the range of the dialog
+        progress = QProgressDialog(self.tr(u"Adding shapes", 'GeometryTool'), self.tr(u"Cancel", 'GeometryTool'),
+                                   0, -(-count // GRID_CHUNK_SIZE), qgis_interface().mainWindow())
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)
+        clipped = []
+
+        def build_chunk(start):
+            """Returns the shapes of the chunk of cells from start, in the CRS of the layer"""
+            end = min(start + GRID_CHUNK_SIZE, count)
+            with self.profiler.stage('geometry'):
+                # only the centers of this chunk, the whole grid may not fit in memory
+                xs, ys = grid_centers(cx, cy, pitch_x, pitch_y, rows, columns, start, end)
+                wkbs = shapes_wkb(shape, xs, ys, width, height, rotation, segments)
+            if transform is not None:
+                # all vertices of the chunk in one call, instead of one transform per shape
+                with self.profiler.stage('transform'):
+                    wkbs = transform_polygons_wkb(wkbs, transform)
+            return [geometry_from_wkb(wkb) for wkb in wkbs]
+
+        def commit_chunk(start):
+            self.commit_shapes(build_chunk(start), layer, lambda geometries: chunk_clipped(start, geometries),
+                               failed=progress.close)
+
+        def chunk_clipped(start, geometries):
+            clipped.extend(geometries)
+            end = start + len(geometries)
+            progress.setValue(-(-end // GRID_CHUNK_SIZE))
+            if progress.wasCanceled():
+                # nothing has been added yet
+                progress.close()
+            elif end < count:
+                commit_chunk(end)
+            else:
+                progress.close()
+                self.add_grid(layer, clipped)
+
+        commit_chunk(0)
+        self.reset()
+
+    def add_grid(self, layer, geometries):
+        """
+        Adds the shapes of a grid to the layer, or to its staging layer, in one go. The undo command is
+        opened and closed without returning to the event loop, so no other edit can end up in it.
+
+        :type layer: qgis.core.QgsVectorLayer
+        :param geometries: shapes in the CRS of the layer
+        :type geometries: list[qgis.core.QgsGeometry]
+        """
+        defaults = default_values(layer)
+        staged = staging().staging_layer(layer, create=True) if staging().enabled else None
+        if staged is None:
+            layer.beginEditCommand(self.tr(u"Add grid", 'GeometryTool'))
+        for start in range(0, len(geometries), GRID_CHUNK_SIZE):
+            features = []
+            for geometry in geometries[start:start + GRID_CHUNK_SIZE]:
+                feature = QgsFeature(layer.fields())
+                feature.setGeometry(geometry)
+                with self.profiler.stage('default_values'):
+                    defaults.apply(feature)
+                features.append(feature)
+            with self.profiler.stage('add_feature'):
+                if staged is None:
+                    layer.addFeatures(features)
+                else:
+                    staged.add_features(features)
+        if staged is None:
+            layer.endEditCommand()
+            # ending the edit command does not repaint the layer
+            layer.triggerRepaint()
+
+    def commit_shapes(self, geometries, layer, add, key=None, failed=None):
+        """
+        Avoids intersections for shapes in the CRS of the layer if the project asks for it, and then calls
+        the add function with the resulting geometries. GEOS runs in a background task, so the shapes may
+        be added later. Shapes are committed in order, each after the ones before have been added, so
+        they are neighbours of each other.
+
+        :type geometries: list[qgis.core.QgsGeometry]
+        :type layer: qgis.core.QgsVectorLayer
+        :param add: function that takes the list of geometries
+        :param key: shape key if the only geometry is the shape of the tool, to reuse the clipped preview
+        :param failed: function that is called if the shapes are not added, a warning by default
+        """
+        idle = not self.commitQueue and self.commitTask is None
+        if idle and key is not None and self.clipResult is not None and self.clipKey == key:
+            # the clipped preview of the very same shape has already been computed in the background
+            add([QgsGeometry(self.clipResult)])
+            return
+
+        self.commitQueue.append((geometries, layer.id(), add, failed or self.commit_failed))
+        if idle:
+            self.next_commit()
+
+    def next_commit(self):
+        """Clips the first shapes in the commit queue in a background task, or adds them if there is nothing to avoid"""
+        while self.commitQueue and self.commitTask is None:
+            geometries, layer_id, add, failed = self.commitQueue[0]
+            layer = QgsProject.instance().mapLayer(layer_id)
+            if layer is None:
+                # the layer has been removed in the meantime
+                self.commitQueue.popleft()
+                failed()
+                continue
+
+            layers_to_check = self.layers_to_check()
+            if layers_to_check is not None:
+                if not self.intersections_ready(layers_to_check, self.next_commit):
+                    return
+                with self.profiler.stage('neighbours'):
+                    candidates = [neighbours(geometry, layer, layers_to_check) for geometry in geometries]
+                if any(candidates):
+                    self.commitTask = start_clip(geometries, candidates, self.commit_clipped, self.commit_canceled)
+                    return
+
+            # added before it leaves the queue, so shapes committed by add wait for their turn
+            add(geometries)
+            self.commitQueue.popleft()
+
+    def commit_clipped(self, geometries):
+        """Adds the first shapes in the commit queue once they are clipped, and continues with the next"""
+        self.commitTask = None
+        _, layer_id, add, failed = self.commitQueue[0]
+        if QgsProject.instance().mapLayer(layer_id) is not None:
+            add(geometries)
+        else:
+            failed()
+        self.commitQueue.popleft()
+        self.next_commit()
+
+    def commit_canceled(self):
+        """The clip task of the first shapes in the commit queue has been canceled, they are not added"""
+        self.commitTask = None
+        self.commitQueue.popleft()[3]()
+        self.next_commit()
+
+    def commit_failed(self):
+        qgis_interface().messageBar().pushWarning(self.tr(u"Add feature", 'GeometryTool'),
+                                                  self.tr(u"The shape has not been added", 'GeometryTool'))
+
+    def cell(self):
+        """
+        Returns the just created shape as a grid cell: the center, the width and height of the shape
+        as used by the shape kernel, and the extent of the cell
+
+        *To be implemented by child class*
+
+        :rtype: (float, float, float, float, float, float)
+        """
+        pass
 
     def geometry(self, **kwargs):
         """
@@ -283,44 +720,172 @@ class GeometryTool(QgsMapTool):
         """
         pass
 
-    def transformed_geometry(self, layer):
+    def output_segments(self, layer):
+        """
+        Returns the number of segments for the shape: either fixed, or from the maximum deviation
+        (in layer units) between the true shape and its segments
+
+        :type layer: qgis.core.QgsMapLayer
+        :rtype: int
+        """
+        if not self.dlg.adaptive.isChecked():
+            return self.dlg.segments.value()
+
+        # the shape is built in map units, so convert the tolerance from layer units
+        factor = QgsUnitTypes.fromUnitToUnitFactor(layer.crs().mapUnits(), self.canvas.mapUnits())
+        rect = self.selection_rect()
+        return segments_for_tolerance(max(rect.width(), rect.height()), self.dlg.tolerance.value() * factor)
+
+    def shape_key(self, layer):
         """
-        Takes a layer and returns the geometry shape as a QgsGeometry object in that layer's CRS
-        and optionally avoids intersections based on project settings.
+        Returns a key of everything the output geometry of the shape depends on, so the work for a
+        shape that has not changed can be skipped without building its geometry
+
+        :type layer: qgis.core.QgsMapLayer
+        :rtype: tuple
+        """
+        return (layer.id(), self.startPoint.x(), self.startPoint.y(), self.endPoint.x(), self.endPoint.y(),
+                self.shapeRotation, self.dlg.adaptive.isChecked(), self.dlg.segments.value(),
+                self.dlg.tolerance.value(), self.dlg.curved.isChecked(), QgsProject.instance().crs())
+
+    def shape_geometry(self, layer):
+        """
+        Returns the geometry shape in the CRS of the layer, before avoiding intersections
 
-        :param layer: target layer for transformation
         :type layer: qgis.core.QgsMapLayer
-        :return: geometry in target layer CRS
         :rtype: qgis.core.QgsGeometry
         """
-        segments = self.dlg.segments.value()
-        geometry = self.geometry(seg=segments)
+        # fall back to segments automatically for layers that only support linear geometries
+        curved = self.dlg.curved.isChecked() and supports_curves(layer)
+        with self.profiler.stage('geometry'):
+            geometry = self.geometry(seg=self.output_segments(layer), curved=curved)
+        if curved and QgsWkbTypes.isMultiType(layer.wkbType()):
+            geometry.convertToMultiType()
+        return self.project_to_layer(geometry, layer)
+
+    def project_to_layer(self, geometry, layer):
+        """
+        Transforms a geometry in the project CRS to the CRS of the layer, in place
 
+        :type geometry: qgis.core.QgsGeometry
+        :type layer: qgis.core.QgsMapLayer
+        :rtype: qgis.core.QgsGeometry
+        """
         source_crs = QgsProject.instance().crs()
-        tr = QgsCoordinateTransform(source_crs, layer.crs(), QgsProject.instance())
-
         if source_crs != layer.crs():
-            geometry.transform(tr)
+            with self.profiler.stage('transform'):
+                geometry.transform(transform_cache().transform(source_crs, layer))
+        return geometry
 
+    def layers_to_check(self):
+        """
+        Returns the layers the shape must not overlap according to the project settings, or None
+        if intersections are allowed
+
+        :rtype: list[qgis.core.QgsVectorLayer]
+        """
         # Check if the project has 'avoid intersections' enabled and act accordingly, allow by default
         intersection_mode = self.avoidIntersectionsMode.AllowIntersections
         if Qgis.versionInt() > 31400:
             intersection_mode = QgsProject.instance().avoidIntersectionsMode()
 
-        if intersection_mode == self.avoidIntersectionsMode.AllowIntersections :
-            return geometry
-
         if intersection_mode == self.avoidIntersectionsMode.AvoidIntersectionsCurrentLayer:
-            layers_to_check = [self.canvas.currentLayer()]
+            layers = [self.canvas.currentLayer()]
         elif intersection_mode == self.avoidIntersectionsMode.AvoidIntersectionsLayers:
-            layers_to_check = QgsProject.instance().avoidIntersectionsLayers()
-
-        if Qgis.versionInt() < 33400:
-            geometry.avoidIntersections(layers_to_check)
+            layers = QgsProject.instance().avoidIntersectionsLayers()
         else:
-            geometry.avoidIntersectionsV2(layers_to_check)     
-        
-        return geometry
+            return None
+        # only polygons can be overlapped, the current layer may be e.g. a raster layer
+        layers = [check_layer for check_layer in layers if is_polygon_layer(check_layer)]
+        # staged shapes are not in their layer yet, but must not be overlapped either
+        return layers + staging().staging_layers(layers)
+
+    def intersections_ready(self, layers_to_check, callback):
+        """
+        Returns True if the intersection indexes of the layers to check are ready. Otherwise they are
+        built in the background and the callback is called once they all are.
+
+        :type layers_to_check: list[qgis.core.QgsVectorLayer]
+        :rtype: bool
+        """
+        indexes = [intersection_index(check_layer) for check_layer in layers_to_check]
+        pending = [index for index in indexes if not index.ready]
+        if not pending:
+            return True
+
+        def index_ready():
+            if all(index.ready for index in pending):
+                callback()
+        for index in pending:
+            index.build_in_background(index_ready)
+        return False
+
+    def update_clip_preview(self):
+        """
+        Clips the shape by its neighbours in a background task if the project avoids intersections,
+        and shows the clipped shape when it is ready. Nothing is done while the shape does not change,
+        a pending clip of an older shape is canceled. The indexes of the neighbours are built in the
+        background first, the preview is clipped when they are ready.
+        """
+        layers_to_check = self.layers_to_check()
+        layer = self.canvas.currentLayer()
+        if layers_to_check is None or not is_polygon_layer(layer) or self.selection_rect() is None:
+            self.cancel_clip()
+            return
+
+        key = self.shape_key(layer)
+        if key == self.clipKey:
+            # this very shape is being clipped or has been clipped
+            return
+        self.cancel_clip()
+        if not self.intersections_ready(layers_to_check, self.retry_clip_preview):
+            return
+
+        self.clipKey = key
+        geometry = self.shape_geometry(layer)
+        with self.profiler.stage('neighbours'):
+            candidates = neighbours(geometry, layer, layers_to_check)
+        if not candidates:
+            # nothing to clip, the shape is the result
+            self.clipResult = geometry
+            return
+
+        generation = self.clipGeneration
+        self.clipTask = start_clip([geometry], [candidates],
+                                   lambda result: self.show_clipped(generation, layer, result[0]))
+
+    def retry_clip_preview(self):
+        """Clips the preview once the indexes of the neighbours are ready, if there still is a preview"""
+        if self.previewItem is not None and (self.capturing or self.stampOffset is not None):
+            self.update_clip_preview()
+
+    def show_clipped(self, generation, layer, geometry):
+        """Shows the clipped shape of a background task, unless the shape has changed since it was started"""
+        if generation != self.clipGeneration or self.previewItem is None:
+            return
+        self.clipTask = None
+        self.clipResult = geometry
+        self.clipBand.setToGeometry(geometry, layer)
+        self.clipBand.show()
+        # only the outline of the shape, the clipped area is filled
+        self.previewItem.set_filled(False)
+
+    def cancel_clip(self):
+        """Cancels the background clip of the shape and hides its result"""
+        self.clipGeneration += 1
+        if self.clipTask is not None:
+            try:
+                self.clipTask.cancel()
+            except RuntimeError:
+                # the task has finished and is deleted
+                pass
+            self.clipTask = None
+        self.clipKey = None
+        self.clipResult = None
+        if self.clipBand is not None:
+            self.clipBand.reset(GeometryType.PolygonGeometry)
+        if self.previewItem is not None:
+            self.previewItem.set_filled(True)
 
     def selection_rect(self):
         """
@@ -339,53 +904,68 @@ class GeometryTool(QgsMapTool):
         pass
 
     def activate(self):
-        self.statusBar = iface.mainWindow().statusBar()
-        self.statusBar.showMessage(self.tr(u"Hold SHIFT to lock the ratio for perfect squares and circles", 'GeometryTool'))
+        self.statusBar = qgis_interface().mainWindow().statusBar()
+        self.profiler.load_settings()
+        self.connect_dialog()
+        self.dlg.rotation.setValue(self.shapeRotation)
+        self.preview_item()
+        layers_to_check = self.layers_to_check()
+        if layers_to_check is not None:
+            # read the neighbours in the background before the first shape needs them
+            self.intersections_ready(layers_to_check, self.retry_clip_preview)
+        if self.mode == MODE_STAMP:
+            self.statusBar.showMessage(self.tr(u"Draw the first shape to set the size, then click to place shapes. "
+                                               u"ESC or right click to set a new size", 'GeometryTool'))
+        else:
+            self.statusBar.showMessage(self.tr(u"Hold SHIFT to lock the ratio for perfect squares and circles, CTRL to rotate", 'GeometryTool'))
         super(GeometryTool, self).activate()
 
     # fixme: use for further cleanup?
     def deactivate(self):
         self.statusBar.clearMessage()
+        self.end_stamp()
         self.reset()
+        if self.scheduler.received:
+            QgsMessageLog.logMessage(self.tr(u"Preview updates: {} rendered, {} dropped", 'GeometryTool').format(
+                self.scheduler.rendered, self.scheduler.dropped), 'GeometryShapes', Qgis.Info)
+            self.scheduler.reset_statistics()
+        if transform_cache().hits or transform_cache().misses:
+            QgsMessageLog.logMessage(self.tr(u"Transform cache: {} hits, {} misses", 'GeometryTool').format(
+                transform_cache().hits, transform_cache().misses), 'GeometryShapes', Qgis.Info)
+            transform_cache().reset_statistics()
+        self.profiler.report()
+        self.connect_dialog(False)
+        if self.previewItem is not None:
+            self.canvas.scene().removeItem(self.previewItem)
+            self.canvas.scene().removeItem(self.clipBand)
+            self.previewItem = None
+            self.clipBand = None
         super(GeometryTool, self).deactivate()
 
 
 class OvalGeometryTool(GeometryTool):
-    def stop_capturing(self):
+    shape = OVAL
+
+    def show_dimensions(self):
+        super(OvalGeometryTool, self).show_dimensions()
         self.dlg.label.setText(self.tr(u"Radius (x)"))
         self.dlg.label_2.setText(self.tr(u"Radius (y)"))
-        super(OvalGeometryTool, self).stop_capturing()
+        self.dlg.adjustSize()
 
-    def show_rubberband(self):
-        if self.startPoint.x() == self.endPoint.x() or self.startPoint.y() == self.endPoint.y():
-            return
+    def geometry(self, seg=50, curved=False):
+        rect = self.selection_rect()
+        if curved:
+            coords = oval_arc_coords(self.startPoint.x(), self.startPoint.y(), rect.width(), rect.height(),
+                                     self.shapeRotation)
+            return geometry_from_wkb(curve_polygon_wkb(coords))
+
+        coords = oval_coords(self.startPoint.x(), self.startPoint.y(), rect.width(), rect.height(), seg,
+                             self.shapeRotation)
+        return geometry_from_wkb(polygon_wkb(coords))
 
-        geom = self.geometry()
-        self.rubberBand.reset(GeometryType.PolygonGeometry)
-        self.rubberBand.setToGeometry(geom, None)
-        self.rubberBand.show()
-
-        self.helperBand.reset(GeometryType.PolygonGeometry)
-        box = QgsGeometry.fromRect(geom.boundingBox())
-        line = QgsGeometry.fromPolylineXY([self.startPoint, self.endPoint])
-        self.helperBand.setToGeometry(box, None)
-        self.helperBand.addGeometry(line, None)
-        self.helperBand.show()
-
-    def geometry(self, seg=50):
-        coords = []
-        r_x = self.selection_rect().width()
-        r_y = self.selection_rect().height()
-        for i in range(seg):
-            angle = i * 2 * math.pi / seg
-            x = r_x * math.cos(angle)
-            y = r_y * math.sin(angle)
-            coords.append(QgsPointXY(x, y))
-
-        # move to correct position
-        geom = QgsGeometry.fromPolygonXY([coords])
-        geom.translate(self.startPoint.x(), self.startPoint.y())
-        return geom
+    def cell(self):
+        rect = self.selection_rect()
+        return self.startPoint.x(), self.startPoint.y(), rect.width(), rect.height(), 2 * rect.width(), 2 * rect.height()
 
     def tooltip_text(self, rect):
         precision = 5 if rect.width() < 1 or rect.height() < 1 else 2
@@ -397,21 +977,18 @@ class OvalGeometryTool(GeometryTool):
 
 
 class RectangleGeometryTool(GeometryTool):
-    def show_rubberband(self):
-        if self.startPoint.x() == self.endPoint.x() or self.startPoint.y() == self.endPoint.y():
-            return
-
-        self.rubberBand.reset(GeometryType.PolygonGeometry)
-        self.rubberBand.setToGeometry(self.geometry(), None)
-        self.rubberBand.show()
-
-        line = QgsGeometry.fromPolylineXY([self.startPoint, self.endPoint])
-        self.helperBand.reset(GeometryType.LineGeometry)
-        self.helperBand.setToGeometry(line, None)
-        self.helperBand.show()
+    shape = RECTANGLE
 
     def geometry(self, **kwargs):
-        return QgsGeometry.fromRect(self.selection_rect())
+        rect = self.selection_rect()
+        coords = rectangle_coords(rect.xMinimum(), rect.yMinimum(), rect.xMaximum(), rect.yMaximum(),
+                                  self.shapeRotation)
+        return geometry_from_wkb(polygon_wkb(coords))
+
+    def cell(self):
+        rect = self.selection_rect()
+        center = rect.center()
+        return center.x(), center.y(), rect.width(), rect.height(), rect.width(), rect.height()
 
     def tooltip_text(self, rect):
         precision = 5 if rect.width() < 1 or rect.height() < 1 else 2
@@ -1,5 +1,5 @@
 FORMS = ../geometry_shapes_dialog_base.ui
 
-SOURCES = ../geometry_shapes.py ../geometry_shapes_tools.py
+SOURCES = ../geometry_shapes.py ../geometry_shapes_tools.py ../geometry_shapes_processing.py
 
 TRANSLATIONS = geometry_shapes_nl.ts
\ No newline at end of file